@@ -0,0 +1,85 @@
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+import asyncio
+
+
+class AsyncBatcher:
+    """
+    Coalesces items submitted concurrently into batches handled by a single call.
+
+    A consumer task waits for the first item, then keeps collecting until the
+    batch is full or max_wait_ms has passed, and hands the whole batch to
+    process_batch. Each caller gets back the result at its own position; a
+    result that is an Exception is raised to that caller only.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch: int = 16, max_wait_ms: float = 20):
+        """
+        Initialize the batcher.
+
+        Args:
+            process_batch: Coroutine function mapping a list of items to a list of results
+            max_batch: Maximum number of items per batch (default: 16)
+            max_wait_ms: Longest time to wait for a batch to fill up (default: 20)
+        """
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        # Created in start() on the running event loop
+        self.queue: Optional[asyncio.Queue] = None
+        self.consumer: Optional[asyncio.Task] = None
+        self.running: set = set()
+
+    def start(self) -> None:
+        """Start the consumer task. Must be called from the event loop."""
+        self.queue = asyncio.Queue()
+        self.consumer = asyncio.create_task(self._consume())
+
+    async def stop(self) -> None:
+        """Stop collecting new batches and wait for the ones in progress."""
+        if self.consumer is not None:
+            self.consumer.cancel()
+            await asyncio.gather(self.consumer, return_exceptions=True)
+            self.consumer = None
+        await asyncio.gather(*self.running, return_exceptions=True)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Run the batch in the background so the next one can fill up meanwhile
+            task = asyncio.create_task(self._run(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            # Skip callers that went away while the batch was running
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -1,2 +1,32 @@
+import os
+
 DIRECTORY = './data'  # directory to store the pdf's from where the RAG model should take the documents from
+CHUNK_SIZE = 1200  # maximum characters per document chunk
+CHUNK_OVERLAP = 300  # characters of trailing sentences repeated at the start of the next chunk
+VECTORSTORE_CACHE_DIR = './vectorstore_cache'  # built FAISS indexes, keyed by a hash of the files in DIRECTORY
+EMBEDDING_MODEL = 'models/text-embedding-004'  # Google embeddings model for document chunks and queries
+EMBEDDING_CACHE_PATH = './vectorstore_cache/embeddings.sqlite'  # document chunk embeddings, keyed by a hash of the chunk text
+EMBEDDING_BATCH_SIZE = 100  # texts per embeddings API request (the Google API accepts at most 100)
+EMBEDDING_CONCURRENCY = 8  # embeddings API requests sent in parallel while indexing
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # answers kept for exact repeats of a (normalized) query
+QUERY_BATCH_SIZE = 16  # most concurrent queries embedded and retrieved together in one batch
+QUERY_BATCH_WAIT_MS = 20  # how long the first query of a batch waits for others to join
+SEMANTIC_CACHE_DIR = './semantic_cache'  # directory where cached answers are persisted between restarts
+SEMANTIC_CACHE_THRESHOLD = 0.92  # minimum cosine similarity for a cached answer to be reused
+SEMANTIC_CACHE_TTL = 24 * 60 * 60  # seconds before a cached answer expires
+SEMANTIC_CACHE_MAX_ENTRIES = 10000  # number of answers kept before the least recently used is evicted
+
+RETRIEVER_SEARCH_TYPE = 'mmr'  # 'mmr' diversifies the retrieved chunks, 'similarity' returns the top matches as-is
+RETRIEVER_K = 8  # number of chunks passed to the LLM as context
+RETRIEVER_FETCH_K = 30  # number of candidate chunks MMR picks the final k from
+
+FAISS_INDEX_TYPE = 'flat'  # 'flat' (exact brute-force search), 'flat_fp16' (exact search over float16 vectors), 'hnsw' (full float32 vectors) or 'hnsw_sq8' (int8 scalar-quantized vectors; opt in only after checking its recall on real queries)
+HNSW_M = 32  # neighbours per node in the HNSW graph
+HNSW_EF_CONSTRUCTION = 200  # candidate list size while building the graph (higher = better recall, slower build)
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))  # candidate list size at query time, must be at least RETRIEVER_FETCH_K (higher = better recall, slower search)
+FAISS_THREADS = int(os.getenv("FAISS_THREADS", os.cpu_count() or 4))  # OpenMP threads FAISS uses for search
 
+# Idle FAISS OpenMP threads sleep instead of spinning. This only takes effect if set before
+# faiss is first imported, which happens through helper_functions after it imports config.
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
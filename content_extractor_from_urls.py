@@ -1,12 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import asyncio
+from bs4 import BeautifulSoup, NavigableString, Tag
 from urllib.parse import urlparse
 import re
-import time
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections.abc import Mapping
+from contextlib import closing
 import json
+import hashlib
+import sqlite3
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from host_throttle import HostThrottle
 import logging
+from logger import DedupFilter
 import argparse
 
 # Set up logging
@@ -16,19 +24,319 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 logger = logging.getLogger(__name__)
+logger.addFilter(DedupFilter())
+
+# Retry policy for transient upstream failures
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3  # seconds, doubled on each attempt
+RETRY_STATUSES = {502, 503, 504}
+
+# Elements that never carry page content
+_UNWANTED_ELEMENTS = [
+    'script', 'style', 'meta', 'link', 'noscript', 'iframe',
+    '[style*="display:none"]', '[style*="display: none"]'
+]
+
+# Common elements to filter out (navigation, header, footer, etc.)
+_ELEMENTS_TO_FILTER = [
+    'header', 'footer', 'nav', '#header', '#footer', '#nav', 
+    '.header', '.footer', '.nav', '.navigation', '.menu',
+    '.sidebar', '.breadcrumb', '.banner', '.cookie-banner',
+    '.social-links', '.copyright', '.announcement',
+    '[role="navigation"]', '[role="banner"]', '[role="contentinfo"]',
+    '.navbar', '.site-header', '.site-footer', '.top-bar',
+    '.search-form', '.download-app', '.mobile-nav',
+    '.main-navigation', '#main-navigation', '#primaryNav',
+    '.social-media', '.advertisement', '.ad-container',
+    'aside', '.sidebar', '.popular-links', '.quick-links',
+    '#sideNavigation', '.primary-nav',
+    '[id*="header"]', '[id*="footer"]', '[id*="menu"]', 
+    '[id*="navigation"]', '[id*="nav"]', '[class*="header"]',
+    '[class*="footer"]', '[class*="menu"]', '[class*="navigation"]',
+    '[class*="nav-"]', '[class*="-nav"]'
+]
+
+# AngelOne-specific selectors (based on inspection of the site structure)
+_ANGELONE_SELECTORS = [
+    '.open-account-area', '.download-app-area', '.sip-calc-area',
+    '.search-area', '.top-nav', '.main-nav', '.primary-nav',
+    '.footer-top', '.footer-bottom', '.copyright-area',
+    '.login-area', '.quick-links', '.popular-stocks',
+    '.mobile-menu', '.mobile-nav', '.pricing-section',
+    'nav', '[id*="menu"]', '[class*="menu"]',
+    '.open-account-btn', '.login-btn', '.download-section',
+    '.user-links', '.open-demat', '.quick-links',
+    '.popular-links', '.attention-investors',
+    '.open-free-demat-account', '.oda-footer',
+    'form', '.social-links',
+    '.we-are-here-to-help-you', '.quick-links-10', 
+    '.connect-with-us', '.partnership-request', '.media-queries',
+    '.en', '.hi'
+]
+
+# Single selector so the DOM is walked once instead of once per selector
+_FILTER_SELECTOR = ", ".join(_UNWANTED_ELEMENTS + _ELEMENTS_TO_FILTER + _ANGELONE_SELECTORS)
+
+# Specific AngelOne content containers, in order of preference
+_CONTENT_SELECTORS = [
+    '.support-container', '.faq-container', '.support-content', 
+    '#support-content', '.article-content', '.content-area',
+    'main', 'article', '[role="main"]', '.faq-content'
+]
+_CONTENT_SELECTOR = ", ".join(_CONTENT_SELECTORS)
+
+# Tags collected as headings and as paragraphs in the final text pass
+_HEADING_TAGS = {'h2', 'h3', 'h4', 'h5', 'h6'}
+_PARAGRAPH_TAGS = {'p', 'li', 'section'}
+_TEXT_TAGS = list(_HEADING_TAGS | _PARAGRAPH_TAGS)
+
+# Text that marks navigation or call-to-action blocks (matched case-insensitively)
+_FALLBACK_NAV_WORDS = [
+    'login', 'sign up', 'open account', 'download', 'download app', 
+    'register', 'create account', 'quick links', 'we are here to help you',
+    'connect with us', 'partnership request', 'media queries'
+]
+_HEADING_NAV_WORDS = ['menu', 'navigation', 'login', 'download', 'open demat']
+_PARAGRAPH_NAV_WORDS = ['login', 'signup', 'sign up', 'download', 'cookie', 'privacy', 'open demat', 'download app']
+
+# Sections that appear on every page (matched case-sensitively)
+_COMMON_PHRASES = [
+    "We are here to help you", "Quick Links", "Track Application Status",
+    "Want to connect with us?", "Connect with us", "Partnership Request", 
+    "Media Queries", "Our experts will be happy to assist you",
+    "Still have any queries?", "Connect with our support team", 
+    "For any partnership requests please reach us at", "EMAIL US",
+    "partners@angelbroking.com", "Learn More", "Create Ticket",
+    "022-40003600", "CONTACT US"
+]
+
+# Precompiled patterns used while cleaning every page
+_MAIN_ID_RE = re.compile(r'(main|content|article|post)', re.I)
+_TITLE_SUFFIX_RE = re.compile(r'\s*[\-\|]\s*.+$')
+_WS_MULTI_NL = re.compile(r'\n\s*\n')
+_WS_SPACES = re.compile(r' +')
+_WS_SINGLE_NL = re.compile(r'(?<!\n)\n(?!\n)')
+_FALLBACK_NAV_RE = re.compile("|".join(map(re.escape, _FALLBACK_NAV_WORDS)), re.I)
+_HEADING_NAV_RE = re.compile("|".join(map(re.escape, _HEADING_NAV_WORDS)), re.I)
+_PARAGRAPH_NAV_RE = re.compile("|".join(map(re.escape, _PARAGRAPH_NAV_WORDS)), re.I)
+_COMMON_PHRASES_RE = re.compile("|".join(map(re.escape, _COMMON_PHRASES)))
+
+def _reroot(element: Tag) -> BeautifulSoup:
+    """Move an element into its own document without serializing and re-parsing it."""
+    document = BeautifulSoup('', 'lxml')
+    document.append(element.extract())
+    return document
+
+def _remove_text_blocks(root: Tag, pattern: re.Pattern) -> None:
+    """Remove the parent of every text node matching pattern, using a single walk of the tree."""
+    matches = [node for node in root.descendants
+               if isinstance(node, NavigableString) and pattern.search(node)]
+    for node in matches:
+        # Skip text already removed along with an earlier match
+        if node.decomposed:
+            continue
+        parent = node.parent
+        if parent:
+            parent.decompose()
+
+def _extract_text_from_soup(soup: BeautifulSoup) -> str:
+    """
+    Extract and clean text from BeautifulSoup object, focusing on main content
+    and excluding navigation, headers, footers and other non-essential parts.
+    
+    The soup is filtered in place, so callers should pass a freshly parsed tree.
+    """
+    soup_copy = soup
+    
+    # Remove unwanted, navigation and AngelOne-specific elements in one pass
+    for element in soup_copy.select(_FILTER_SELECTOR):
+        # Skip elements already removed along with a filtered ancestor
+        if not element.decomposed:
+            element.decompose()
+            
+    # Try to identify the main content area
+    # First, check for specific content identifiers
+    main_content = None
+    
+    # Look for specific AngelOne content containers. All candidates are found in one
+    # walk, then the first match of the most preferred selector is picked.
+    candidates = soup_copy.select(_CONTENT_SELECTOR)
+    for content_selector in _CONTENT_SELECTORS:
+        main_content = next((el for el in candidates if el.css.match(content_selector)), None)
+        if main_content:
+            break
+    
+    # If we couldn't find a specific content container, try a more generic approach
+    if not main_content:
+        main_content = soup_copy.find(attrs={'id': _MAIN_ID_RE})
+    if not main_content:
+        main_content = soup_copy.find(attrs={'class': _MAIN_ID_RE})
+    
+    # If we found a main content container, use it
+    if main_content:
+        # Extract only from main content
+        soup_copy = _reroot(main_content)
+    else:
+        # If we can't find a clear main content area, try to remove common non-content text
+        # like repetitive navigation links, and then use what's left
+        _remove_text_blocks(soup_copy, _FALLBACK_NAV_RE)
+        
+        # Remove elements with very few words (likely navigation or button text)
+        for element in soup_copy.find_all(['a', 'span', 'button']):
+            text = element.get_text().strip()
+            if text and len(text.split()) <= 3:
+                element.decompose()
+        
+        # Try to identify the main content based on text density
+        # Content usually has the most text and paragraphs
+        content_candidates = []
+        for element in soup_copy.find_all(['div', 'section', 'article', 'main']):
+            if element.find_all(['p', 'h2', 'h3', 'li']):
+                content_candidates.append((element, len(element.get_text())))
+        
+        # Sort by text length (descending) and use the one with most text
+        if content_candidates:
+            content_candidates.sort(key=lambda x: x[1], reverse=True)
+            soup_copy = _reroot(content_candidates[0][0])
+    
+    # Extract title (prefer page-specific title over site title)
+    title = ""
+    if soup_copy.h1:
+        title = soup_copy.h1.get_text().strip()
+    elif soup_copy.title:
+        title = soup_copy.title.get_text().strip()
+        # Remove site name if present (usually after " - " or " | ")
+        title = _TITLE_SUFFIX_RE.sub('', title)
+    
+    # Remove "Quick Links" and common sections that appear on every page
+    _remove_text_blocks(soup_copy, _COMMON_PHRASES_RE)
+    
+    # Collect headings (h2-h6, h1 is usually handled as title) and paragraphs
+    # in a single walk, dispatching each element to its bucket by tag name
+    headings = []
+    paragraphs = []
+    seen_paragraphs = set()
+    for tag in soup_copy.find_all(_TEXT_TAGS):
+        if tag.name in _HEADING_TAGS:
+            # Skip empty headings or those that look like navigation/menu items
+            heading_text = tag.get_text().strip()
+            if heading_text and len(heading_text) > 1 and not _HEADING_NAV_RE.search(heading_text):
+                if not _COMMON_PHRASES_RE.search(heading_text):
+                    headings.append(heading_text)
+            continue
+        
+        # Paragraphs, list items and sections (main content)
+        # Skip empty elements or very short ones that are likely UI elements
+        p_text = tag.get_text().strip()
+        if p_text and len(p_text) > 5:  # Increased minimum length to filter out more noise
+            # Skip elements that are likely navigation or other non-content elements
+            if not _PARAGRAPH_NAV_RE.search(p_text):
+                # Skip text containing common phrases that appear on every page
+                if not _COMMON_PHRASES_RE.search(p_text):
+                    # Skip repetitive text that appears multiple times
+                    if p_text not in seen_paragraphs:
+                        seen_paragraphs.add(p_text)
+                        paragraphs.append(p_text)
+    
+    # Filter text based on word count (skip very short lines that are likely UI elements)
+    filtered_paragraphs = []
+    for p in paragraphs:
+        # Skip very short lines unless they appear to be bullet points or important items
+        if len(p.split()) > 3 or p.startswith('•') or p.startswith('-'):
+            filtered_paragraphs.append(p)
+            
+    # If we have very few paragraphs but headings, it's likely we have a list of links
+    # In this case, we'll keep the headings but add explanatory text
+    if len(filtered_paragraphs) < 3 and headings:
+        filtered_paragraphs.append("This page appears to be a navigation/category page with the following options:")
+    
+    # Combine all text with proper formatting
+    all_text = []
+    if title:
+        all_text.append(f"# {title}")
+        all_text.append("")
+        
+    if headings:
+        all_text.extend(headings)
+        all_text.append("")
+        
+    if filtered_paragraphs:
+        all_text.extend(filtered_paragraphs)
+    
+    # Clean and normalize text
+    text = "\n".join(all_text)
+    
+    # Remove extra whitespace and normalize
+    text = _WS_MULTI_NL.sub('\n\n', text)  # Remove multiple blank lines
+    text = _WS_SPACES.sub(' ', text)  # Normalize spaces
+    text = _WS_SINGLE_NL.sub(' ', text)  # Convert single newlines to spaces
+    
+    # Final cleanup to remove duplicated content
+    lines = text.split('\n')
+    unique_lines = []
+    seen_lines = set()
+    
+    for line in lines:
+        line_lower = line.lower()
+        # Skip empty lines or lines we've seen before
+        if line and line_lower not in seen_lines:
+            unique_lines.append(line)
+            seen_lines.add(line_lower)
+    
+    return '\n'.join(unique_lines)
+
+def _extract_text_from_html(html: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Parse raw HTML and extract its text.
+    
+    Takes bytes rather than a soup object so it can run in a worker process.
+    """
+    soup = BeautifulSoup(html, 'lxml', from_encoding=encoding)
+    return _extract_text_from_soup(soup)
+
+class PageStore(Mapping):
+    """
+    Read-only mapping of URL to extracted text, backed by a pages.sqlite file.
+
+    Pages are read from disk when accessed, so a long crawl's results are never all
+    held in memory. Iteration follows the order of the input URL file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def __getitem__(self, url: str) -> str:
+        with closing(sqlite3.connect(self.path)) as conn:
+            row = conn.execute("SELECT text FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            raise KeyError(url)
+        return row[0]
+
+    def __iter__(self) -> Iterator[str]:
+        with closing(sqlite3.connect(self.path)) as conn:
+            for (url,) in conn.execute("SELECT url FROM pages ORDER BY position"):
+                yield url
+
+    def __len__(self) -> int:
+        with closing(sqlite3.connect(self.path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
 
 class ContentExtractor:
-    def __init__(self, urls_file: str, delay: float = 1.0, output_dir: str = "./data"):
+    def __init__(self, urls_file: str, delay: float = 1.0, output_dir: str = "./data", concurrency: int = 8):
         """
         Initialize the content extractor.
         
         Args:
             urls_file: Path to file containing URLs to extract content from
-            delay: Seconds to wait between requests (default: 1.0)
+            delay: Seconds to wait between requests to the same host (default: 1.0)
             output_dir: Directory to save extracted data (default: "./data")
+            concurrency: Maximum number of requests in flight at once (default: 8)
         """
         self.urls_file = urls_file
         self.delay = delay
+        self.concurrency = concurrency
+        # Requests to a host start at least delay seconds apart however many are in flight
+        self.throttle = HostThrottle(delay)
         self.urls = self._load_urls()
         
         # Ensure output directory exists
@@ -44,11 +352,16 @@ class ContentExtractor:
             'Upgrade-Insecure-Requests': '1'
         }
         
-        # Results storage
-        self.results: Dict[str, str] = {}
+        # Results storage, kept on disk so memory stays flat on long crawls
+        self.pages_path = self.output_dir / "pages.sqlite"
+        self.pages: Optional[sqlite3.Connection] = None
         
         # URLs processed
         self.processed_urls = set()
+        
+        # Cache of previously extracted pages, reused across runs
+        self.cache_path = self.output_dir / "content_cache.sqlite"
+        self.cache: Optional[sqlite3.Connection] = None
     
     def _load_urls(self) -> List[str]:
         """Load URLs from file."""
@@ -56,269 +369,219 @@ class ContentExtractor:
             with open(self.urls_file, 'r', encoding='utf-8') as f:
                 return [line.strip() for line in f if line.strip()]
         except FileNotFoundError:
-            logger.error(f"URL file not found: {self.urls_file}")
+            logger.error("URL file not found: %s", self.urls_file)
             return []
     
-    def extract_content(self) -> Dict[str, str]:
+    def extract_content(self) -> PageStore:
         """
         Extract content from all URLs in the list.
         
         Returns:
-            Dictionary with URLs as keys and extracted content as values
+            Mapping with URLs as keys and extracted content as values, in input order.
+            It reads the pages from disk as they are accessed.
         """
-        for i, url in enumerate(self.urls):
-            logger.info(f"Processing URL {i+1}/{len(self.urls)}: {url}")
-            
-            # Respect crawl delay
-            time.sleep(self.delay)
-            
-            try:
-                response = requests.get(url, headers=self.headers, timeout=15)
-                
-                if response.status_code != 200:
-                    logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
-                    continue
-                    
-                # Check content type
-                content_type = response.headers.get('Content-Type', '')
-                if 'text/html' not in content_type.lower():
-                    logger.warning(f"Skipping non-HTML content at {url}: {content_type}")
-                    continue
-                    
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract and clean text
-                text = self._extract_text_from_soup(soup)
-                self.results[url] = text
-                self.processed_urls.add(url)
-                
-                # Save progress after processing each URL
-                if (i + 1) % 10 == 0:
-                    self._save_progress()
-                    logger.info(f"Progress saved: {i+1}/{len(self.urls)} URLs processed")
-                
-            except Exception as e:
-                logger.error(f"Error processing {url}: {str(e)}")
-        
-        # Final save
-        self._save_progress()
-        return self.results
+        asyncio.run(self._extract_async())
+        return PageStore(self.pages_path)
     
-    def _extract_text_from_soup(self, soup: BeautifulSoup) -> str:
-        """
-        Extract and clean text from BeautifulSoup object, focusing on main content
-        and excluding navigation, headers, footers and other non-essential parts.
-        """
-        # Create a copy to work with
-        soup_copy = BeautifulSoup(str(soup), 'html.parser')
+    async def _extract_async(self) -> None:
+        """Fetch all URLs concurrently and extract text as each page arrives."""
+        sem = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, keepalive_timeout=60)
+        self._open_cache()
+        self._open_pages()
         
-        # Remove unwanted elements
-        for element in soup_copy.select('script, style, meta, link, noscript, iframe, [style*="display:none"], [style*="display: none"]'):
-            element.decompose()
-        
-        # Common elements to filter out (navigation, header, footer, etc.)
-        elements_to_filter = [
-            'header', 'footer', 'nav', '#header', '#footer', '#nav', 
-            '.header', '.footer', '.nav', '.navigation', '.menu',
-            '.sidebar', '.breadcrumb', '.banner', '.cookie-banner',
-            '.social-links', '.copyright', '.announcement',
-            '[role="navigation"]', '[role="banner"]', '[role="contentinfo"]',
-            '.navbar', '.site-header', '.site-footer', '.top-bar',
-            '.search-form', '.download-app', '.mobile-nav',
-            '.main-navigation', '#main-navigation', '#primaryNav',
-            '.social-media', '.advertisement', '.ad-container',
-            'aside', '.sidebar', '.popular-links', '.quick-links',
-            '#sideNavigation', '.primary-nav',
-            '[id*="header"]', '[id*="footer"]', '[id*="menu"]', 
-            '[id*="navigation"]', '[id*="nav"]', '[class*="header"]',
-            '[class*="footer"]', '[class*="menu"]', '[class*="navigation"]',
-            '[class*="nav-"]', '[class*="-nav"]'
-        ]
+        # Pages arrive in completion order but are stored with their place in the
+        # input, so the saved outputs come out in the same order on every run
+        positions: Dict[str, int] = {}
+        for position, url in enumerate(self.urls):
+            positions.setdefault(url, position)
         
-        # Apply filtering for common elements
-        for selector in elements_to_filter:
-            for element in soup_copy.select(selector):
-                element.decompose()
-        
-        # AngelOne-specific selectors (based on inspection of the site structure)
-        angelone_selectors = [
-            '.open-account-area', '.download-app-area', '.sip-calc-area',
-            '.search-area', '.top-nav', '.main-nav', '.primary-nav',
-            '.footer-top', '.footer-bottom', '.copyright-area',
-            '.login-area', '.quick-links', '.popular-stocks',
-            '.mobile-menu', '.mobile-nav', '.pricing-section',
-            'nav', '[id*="menu"]', '[class*="menu"]',
-            '.open-account-btn', '.login-btn', '.download-section',
-            '.user-links', '.open-demat', '.quick-links',
-            '.popular-links', '.attention-investors',
-            '.open-free-demat-account', '.oda-footer',
-            'form', '.social-links',
-            '.we-are-here-to-help-you', '.quick-links-10', 
-            '.connect-with-us', '.partnership-request', '.media-queries',
-            '.en', '.hi'
-        ]
-        
-        # Apply AngelOne-specific filtering
-        for selector in angelone_selectors:
-            for element in soup_copy.select(selector):
-                element.decompose()
-                
-        # Try to identify the main content area
-        # First, check for specific content identifiers
-        main_content = None
-        
-        # Look for specific AngelOne content containers
-        for content_selector in ['.support-container', '.faq-container', '.support-content', 
-                               '#support-content', '.article-content', '.content-area',
-                               'main', 'article', '[role="main"]', '.faq-content']:
-            main_content = soup_copy.select_one(content_selector)
-            if main_content:
-                break
-        
-        # If we couldn't find a specific content container, try a more generic approach
-        if not main_content:
-            main_content = soup_copy.find(attrs={'id': re.compile(r'(main|content|article|post)', re.I)})
-        if not main_content:
-            main_content = soup_copy.find(attrs={'class': re.compile(r'(main|content|article|post)', re.I)})
-        
-        # If we found a main content container, use it
-        if main_content:
-            # Extract only from main content
-            soup_copy = BeautifulSoup(str(main_content), 'html.parser')
-        else:
-            # If we can't find a clear main content area, try to remove common non-content text
-            # like repetitive navigation links, and then use what's left
-            for element in soup_copy.find_all(string=lambda text: text and any(nav_text in text.lower() for nav_text in 
-                                       ['login', 'sign up', 'open account', 'download', 'download app', 
-                                        'register', 'create account', 'quick links', 'we are here to help you',
-                                        'connect with us', 'partnership request', 'media queries'])):
-                parent = element.parent
-                if parent:
-                    parent.decompose()
-            
-            # Remove elements with very few words (likely navigation or button text)
-            for element in soup_copy.find_all(['a', 'span', 'button']):
-                text = element.get_text().strip()
-                if text and len(text.split()) <= 3:
-                    element.decompose()
-            
-            # Try to identify the main content based on text density
-            # Content usually has the most text and paragraphs
-            content_candidates = []
-            for element in soup_copy.find_all(['div', 'section', 'article', 'main']):
-                if element.find_all(['p', 'h2', 'h3', 'li']):
-                    content_candidates.append((element, len(element.get_text())))
+        # One session for the whole run so keep-alive connections are reused, and
+        # text extraction runs in worker processes since parsing is CPU-bound.
+        # Each page is appended to a JSONL progress file as soon as it is extracted.
+        try:
+            with open(self.output_dir / "filtered_content.jsonl", "w", encoding="utf-8") as progress, \
+                    ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+                async with aiohttp.ClientSession(connector=connector, headers=self.headers) as session:
+                    tasks = [self._fetch_and_extract(session, url, sem, pool) for url in self.urls]
+                    for i, task in enumerate(asyncio.as_completed(tasks)):
+                        url, text = await task
+                        if text is None:
+                            continue
+                        
+                        try:
+                            self.pages.execute(
+                                "REPLACE INTO pages(url, position, text) VALUES(?, ?, ?)", (url, positions[url], text)
+                            )
+                            self.pages.commit()
+                        except sqlite3.Error as e:
+                            logger.error("Error saving %s: %s", url, e)
+                            continue
+                        self.processed_urls.add(url)
+                        
+                        progress.write(json.dumps({"url": url, "text": text}, ensure_ascii=False) + "\n")
+                        progress.flush()
+                        
+                        if (i + 1) % 10 == 0:
+                            logger.info("Progress: %s/%s URLs processed", i + 1, len(self.urls))
             
-            # Sort by text length (descending) and use the one with most text
-            if content_candidates:
-                content_candidates.sort(key=lambda x: x[1], reverse=True)
-                soup_copy = BeautifulSoup(str(content_candidates[0][0]), 'html.parser')
-        
-        # Extract title (prefer page-specific title over site title)
-        title = ""
-        if soup_copy.h1:
-            title = soup_copy.h1.get_text().strip()
-        elif soup_copy.title:
-            title = soup_copy.title.get_text().strip()
-            # Remove site name if present (usually after " - " or " | ")
-            title = re.sub(r'\s*[\-\|]\s*.+$', '', title)
-        
-        # Remove "Quick Links" and common sections that appear on every page
-        common_phrases = [
-            "We are here to help you", "Quick Links", "Track Application Status",
-            "Want to connect with us?", "Connect with us", "Partnership Request", 
-            "Media Queries", "Our experts will be happy to assist you",
-            "Still have any queries?", "Connect with our support team", 
-            "For any partnership requests please reach us at", "EMAIL US",
-            "partners@angelbroking.com", "Learn More", "Create Ticket",
-            "022-40003600", "CONTACT US"
-        ]
+            # Final save
+            self._save_progress()
+        finally:
+            self.cache.close()
+            self.cache = None
+            self.pages.close()
+            self.pages = None
+    
+    async def _fetch_and_extract(self, session: aiohttp.ClientSession, url: str, sem: asyncio.Semaphore,
+                                 pool: ProcessPoolExecutor) -> Tuple[str, Optional[str]]:
+        """Fetch a URL and extract its text in the process pool, returning None if skipped."""
+        url, page = await self._fetch(session, url, sem)
+        if page is None:
+            return url, None
         
-        for phrase in common_phrases:
-            for element in soup_copy.find_all(string=lambda text: text and phrase in text):
-                parent = element.parent
-                if parent:
-                    parent.decompose()
+        if page['text'] is not None:
+            logger.info("Unchanged since last run, reusing cached text: %s", url)
+            return url, page['text']
         
-        # Extract headings from h2-h6 (h1 is usually handled as title)
-        headings = []
-        for h_tag in soup_copy.find_all(['h2', 'h3', 'h4', 'h5', 'h6']):
-            # Skip empty headings or those that look like navigation/menu items
-            heading_text = h_tag.get_text().strip()
-            if heading_text and len(heading_text) > 1 and not any(nav_word in heading_text.lower() for nav_word in ['menu', 'navigation', 'login', 'download', 'open demat']):
-                if not any(phrase in heading_text for phrase in common_phrases):
-                    headings.append(heading_text)
+        try:
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(pool, _extract_text_from_html, page['html'], page['encoding'])
+        except Exception as e:
+            logger.error("Error processing %s: %s", url, e)
+            return url, None
         
-        # Extract paragraphs and list items (main content)
-        paragraphs = []
-        for p_tag in soup_copy.find_all(['p', 'li', 'div.content', 'section']):
-            # Skip empty elements or very short ones that are likely UI elements
-            p_text = p_tag.get_text().strip()
-            if p_text and len(p_text) > 5:  # Increased minimum length to filter out more noise
-                # Skip elements that are likely navigation or other non-content elements
-                if not any(nav_word in p_text.lower() for nav_word in ['login', 'signup', 'sign up', 'download', 'cookie', 'privacy', 'open demat', 'download app']):
-                    # Skip text containing common phrases that appear on every page
-                    if not any(phrase in p_text for phrase in common_phrases):
-                        # Skip repetitive text that appears multiple times
-                        if p_text not in paragraphs:
-                            paragraphs.append(p_text)
+        # The cache only saves work on the next run, so failing to update it does not lose the page
+        try:
+            self._update_cache(url, page, text)
+        except sqlite3.Error as e:
+            logger.warning("Could not cache %s: %s", url, e)
+        return url, text
+    
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, sem: asyncio.Semaphore) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Fetch a single URL using a conditional request when it is already cached.
         
-        # Filter text based on word count (skip very short lines that are likely UI elements)
-        filtered_paragraphs = []
-        for p in paragraphs:
-            # Skip very short lines unless they appear to be bullet points or important items
-            if len(p.split()) > 3 or p.startswith('•') or p.startswith('-'):
-                filtered_paragraphs.append(p)
-                
-        # If we have very few paragraphs but headings, it's likely we have a list of links
-        # In this case, we'll keep the headings but add explanatory text
-        if len(filtered_paragraphs) < 3 and headings:
-            filtered_paragraphs.append("This page appears to be a navigation/category page with the following options:")
+        Returns:
+            The URL and a page dict, or None if the page should be skipped. The page
+            holds cached 'text' when the content is unchanged, otherwise the raw
+            'html' bytes and their 'encoding', along with the validators to store
+            once the page has been extracted.
+        """
+        try:
+            cached = self._lookup_cache(url)
+        except sqlite3.Error as e:
+            logger.warning("Could not read cache for %s, fetching it in full: %s", url, e)
+            cached = None
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_mod']:
+                headers['If-Modified-Since'] = cached['last_mod']
         
-        # Combine all text with proper formatting
-        all_text = []
-        if title:
-            all_text.append(f"# {title}")
-            all_text.append("")
-            
-        if headings:
-            all_text.extend(headings)
-            all_text.append("")
+        async with sem:
+            # Respect crawl delay
+            await self.throttle.wait(urlparse(url).netloc)
             
-        if filtered_paragraphs:
-            all_text.extend(filtered_paragraphs)
-        
-        # Clean and normalize text
-        text = "\n".join(all_text)
-        
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # Remove multiple blank lines
-        text = re.sub(r' +', ' ', text)  # Normalize spaces
-        text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)  # Convert single newlines to spaces
-        
-        # Final cleanup to remove duplicated content
-        lines = text.split('\n')
-        unique_lines = []
-        seen_lines = set()
-        
-        for line in lines:
-            line_lower = line.lower()
-            # Skip empty lines or lines we've seen before
-            if line and line_lower not in seen_lines:
-                unique_lines.append(line)
-                seen_lines.add(line_lower)
-        
-        return '\n'.join(unique_lines)
+            logger.info("Fetching: %s", url)
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                        if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                            logger.warning("Retrying %s after HTTP %s", url, response.status)
+                            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+                            continue
+                        
+                        if response.status == 304 and cached:
+                            return url, {'text': cached['text']}
+                        
+                        if response.status != 200:
+                            logger.warning("Failed to fetch %s: HTTP %s", url, response.status)
+                            return url, None
+                        
+                        # Check content type
+                        content_type = response.headers.get('Content-Type', '')
+                        if 'text/html' not in content_type.lower():
+                            logger.warning("Skipping non-HTML content at %s: %s", url, content_type)
+                            return url, None
+                        
+                        body = await response.read()
+                        page = {
+                            'text': None,
+                            'etag': response.headers.get('ETag'),
+                            'last_mod': response.headers.get('Last-Modified'),
+                            'body_sha': hashlib.sha256(body).digest(),
+                        }
+                        
+                        # Servers without validators still resend identical bodies
+                        if cached and cached['body_sha'] == page['body_sha']:
+                            page['text'] = cached['text']
+                        else:
+                            page['html'] = body
+                            page['encoding'] = response.charset
+                        return url, page
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt < MAX_RETRIES:
+                        logger.warning("Retrying %s after error: %s", url, e)
+                        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+                        continue
+                    logger.error("Error processing %s: %s", url, e)
+                except Exception as e:
+                    logger.error("Error processing %s: %s", url, e)
+                    break
+            return url, None
+    
+    def _open_cache(self) -> None:
+        """Open the page cache, creating its table on first use."""
+        self.cache = sqlite3.connect(self.cache_path)
+        self.cache.row_factory = sqlite3.Row
+        self.cache.execute(
+            "CREATE TABLE IF NOT EXISTS cache("
+            "url TEXT PRIMARY KEY, etag TEXT, last_mod TEXT, body_sha BLOB, text TEXT)"
+        )
+        self.cache.commit()
+    
+    def _lookup_cache(self, url: str) -> Optional[sqlite3.Row]:
+        """Return the cached validators and text for a URL, if any."""
+        return self.cache.execute(
+            "SELECT etag, last_mod, body_sha, text FROM cache WHERE url = ?", (url,)
+        ).fetchone()
+    
+    def _update_cache(self, url: str, page: Dict[str, Any], text: str) -> None:
+        """Store freshly extracted text along with the response validators."""
+        self.cache.execute(
+            "REPLACE INTO cache(url, etag, last_mod, body_sha, text) VALUES(?, ?, ?, ?, ?)",
+            (url, page['etag'], page['last_mod'], page['body_sha'], text)
+        )
+        self.cache.commit()
+    
+    def _open_pages(self) -> None:
+        """Open the results store, dropping pages left over from a previous run."""
+        self.pages = sqlite3.connect(self.pages_path)
+        self.pages.execute("DROP TABLE IF EXISTS pages")
+        self.pages.execute("CREATE TABLE pages(url TEXT PRIMARY KEY, position INTEGER, text TEXT)")
+        self.pages.commit()
+    
+    def _iter_pages(self):
+        """Stream (url, text) rows from the results store in input order."""
+        return self.pages.execute("SELECT url, text FROM pages ORDER BY position")
     
     def _save_progress(self) -> None:
         """Save current results to files."""
-        # Save as JSON
+        # Save as JSON, written one entry at a time instead of building the whole dict
+        count = 0
         with open(self.output_dir / "filtered_content.json", "w", encoding="utf-8") as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+            f.write("{")
+            for url, text in self._iter_pages():
+                f.write(("," if count else "") + "\n  ")
+                f.write(f"{json.dumps(url, ensure_ascii=False)}: {json.dumps(text, ensure_ascii=False)}")
+                count += 1
+            f.write("\n}" if count else "}")
             
         # Save as text file (all content combined)
         with open(self.output_dir / "filtered_content.txt", "w", encoding="utf-8") as f:
-            for url, text in self.results.items():
+            for url, text in self._iter_pages():
                 if text.strip():  # Only write non-empty content
                     f.write(f"URL: {url}\n")
                     f.write("=" * 80 + "\n")
@@ -330,7 +593,7 @@ class ContentExtractor:
             for url in sorted(self.processed_urls):
                 f.write(f"{url}\n")
                 
-        logger.info(f"Saved {len(self.results)} pages to {self.output_dir}")
+        logger.info("Saved %s pages to %s", count, self.output_dir)
 
 
 def main():
@@ -341,20 +604,23 @@ def main():
                       help="Delay between requests in seconds (default: 1.0)")
     parser.add_argument("--output", type=str, default="./data",
                       help="Output directory for data (default: ./data)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                      help="Maximum number of concurrent requests (default: 8)")
     args = parser.parse_args()
 
-    logger.info(f"Starting content extraction from URLs in {args.urls_file}")
+    logger.info("Starting content extraction from URLs in %s", args.urls_file)
     
     extractor = ContentExtractor(
         urls_file=args.urls_file,
         delay=args.delay,
-        output_dir=args.output
+        output_dir=args.output,
+        concurrency=args.concurrency
     )
     
-    results = extractor.extract_content()
+    extractor.extract_content()
     
-    logger.info(f"Extraction complete. Processed {len(extractor.processed_urls)} URLs.")
-    logger.info(f"Results saved to {args.output}/filtered_content.txt and {args.output}/filtered_content.json")
+    logger.info("Extraction complete. Processed %s URLs.", len(extractor.processed_urls))
+    logger.info("Results saved to %s/filtered_content.txt and %s/filtered_content.json", args.output, args.output)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
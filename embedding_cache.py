@@ -0,0 +1,78 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Dict, List
+import hashlib
+import os
+import sqlite3
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of document embeddings keyed by the SHA-256 of the chunk text.
+
+    Only chunks that have not been embedded before are sent to the embeddings
+    API, so re-indexing after a change costs as many calls as there are new or
+    edited chunks rather than the size of the whole corpus.
+    """
+
+    # Keys looked up per query, well below SQLite's bound parameter limit
+    LOOKUP_BATCH_SIZE = 500
+
+    def __init__(self, path: str, batch_size: int = 100, concurrency: int = 8):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file the vectors are stored in, created if missing
+            batch_size: Texts per embeddings API request (default: 100, the Google API maximum)
+            concurrency: Embedding requests in flight at once (default: 8)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache(key TEXT PRIMARY KEY, vec BLOB)")
+            conn.commit()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _embed(self, texts: List[str], embeddings) -> np.ndarray:
+        """Embed texts in API-sized batches, sending several batches concurrently."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            results = pool.map(embeddings.embed_documents, batches)
+            return np.array([vector for result in results for vector in result], dtype=np.float32)
+
+    def get_or_compute(self, texts: List[str], embeddings) -> np.ndarray:
+        """Return a float32 (len(texts), dim) array, embedding only the texts not cached yet."""
+        keys = [self._key(text) for text in texts]
+
+        with closing(sqlite3.connect(self.path)) as conn:
+            # Multi-get the vectors that are already cached
+            found: Dict[str, np.ndarray] = {}
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), self.LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start:start + self.LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                for key, vec in conn.execute(f"SELECT key, vec FROM cache WHERE key IN ({placeholders})", batch):
+                    found[key] = np.frombuffer(vec, dtype=np.float32)
+
+            # Embed the misses and store them for next time
+            missing = {key: text for key, text in zip(keys, texts) if key not in found}
+            if missing:
+                vectors = self._embed(list(missing.values()), embeddings)
+                for key, vector in zip(missing, vectors):
+                    found[key] = vector
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache(key, vec) VALUES(?, ?)",
+                    [(key, vector.tobytes()) for key, vector in zip(missing, vectors)],
+                )
+                conn.commit()
+
+        return np.array([found[key] for key in keys], dtype=np.float32)
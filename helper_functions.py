@@ -1,8 +1,184 @@
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from cachetools import LRUCache
+from collections import deque
+from functools import lru_cache
+from threading import Lock
+from typing import List, Sequence, Tuple
+import config
+import hashlib
+import faiss
+import numpy as np
 import os
+import re
 
 load_dotenv()
 
+# Part of the vectorstore manifest hash; bump whenever fast_split's rules change
+# so indexes built from the old chunks are rebuilt
+SPLITTER_VERSION = 2
+
+# Sentence boundaries: whitespace following '.', '!' or '?'
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_WORD_RE = re.compile(r'\s+')
+
+@lru_cache(maxsize=1)
 def get_embeddings():
-    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=os.getenv("GOOGLE_API_KEY"))
+    # A single client is shared by the vectorstore and query-time lookups
+    return GoogleGenerativeAIEmbeddings(model=config.EMBEDDING_MODEL, google_api_key=os.getenv("GOOGLE_API_KEY"))
+
+# Query embeddings by text, shared by single and batched lookups
+_query_embeddings = LRUCache(maxsize=10000)
+_query_embeddings_lock = Lock()
+
+def _embed_queries(texts: List[str]) -> List[List[float]]:
+    embeddings = get_embeddings()
+    if isinstance(embeddings, GoogleGenerativeAIEmbeddings):
+        # One batch request, embedded as queries like embed_query does rather than as documents
+        return embeddings.embed_documents(texts, task_type=embeddings.task_type or "RETRIEVAL_QUERY")
+    return embeddings.embed_documents(texts)
+
+def embed_queries_cached(texts: Sequence[str]) -> List[Tuple[float, ...]]:
+    # Embeds all texts not seen before in a single API call.
+    # Tuples are immutable, so callers cannot corrupt the cached vectors
+    with _query_embeddings_lock:
+        found = {text: _query_embeddings[text] for text in texts if text in _query_embeddings}
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+    if missing:
+        vectors = _embed_queries(missing)
+        with _query_embeddings_lock:
+            for text, vector in zip(missing, vectors):
+                found[text] = _query_embeddings[text] = tuple(vector)
+    return [found[text] for text in texts]
+
+def create_faiss_index(vectors: np.ndarray):
+    # HNSW graph searched by inner product over normalized document vectors.
+    # 'hnsw_sq8' stores the vectors as int8 codes (4x less memory read per query),
+    # 'hnsw' keeps full float32 vectors. 'flat' skips the graph and scores every
+    # vector exactly with a single BLAS matrix product, which is fast enough for
+    # small corpora and gives exact results. 'flat_fp16' does the same exact scan
+    # over vectors stored as float16, halving memory and bandwidth per query.
+    dim = vectors.shape[1]
+    if config.FAISS_INDEX_TYPE == 'flat':
+        return faiss.IndexFlatIP(dim)
+    elif config.FAISS_INDEX_TYPE == 'flat_fp16':
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    elif config.FAISS_INDEX_TYPE == 'hnsw_sq8':
+        index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, config.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    elif config.FAISS_INDEX_TYPE == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, config.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unsupported FAISS_INDEX_TYPE: {config.FAISS_INDEX_TYPE}")
+
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = config.HNSW_EF_SEARCH
+
+    # Quantizers learn per-dimension value ranges before vectors can be added
+    if not index.is_trained:
+        index.train(vectors)
+    return index
+
+def batch_retrieve(vectorstore, query_vectors: Sequence[Sequence[float]], search_type: str = 'mmr',
+                   k: int = 8, fetch_k: int = 30) -> List[List[Document]]:
+    # Retrieves the documents for several queries with a single index search, then
+    # picks each query's documents the way the FAISS retriever does: the top k for
+    # 'similarity', or k of the top fetch_k diversified by MMR for 'mmr'
+    if search_type not in ('mmr', 'similarity'):
+        raise ValueError(f"Unsupported search type: {search_type}")
+    matrix = np.array(query_vectors, dtype=np.float32)
+    _, indices = vectorstore.index.search(matrix, fetch_k if search_type == 'mmr' else k)
+
+    results = []
+    for vector, row in zip(matrix, indices):
+        # -1 pads the row when the index holds fewer vectors than requested
+        ids = [int(i) for i in row if i != -1]
+        if search_type == 'mmr':
+            candidates = [vectorstore.index.reconstruct(i) for i in ids]
+            selected = maximal_marginal_relevance(vector.reshape(1, -1), candidates, k=k, lambda_mult=0.5)
+            ids = [ids[j] for j in selected]
+        results.append([vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in ids])
+    return results
+
+def iter_files(directory: str):
+    # Yields file paths lazily, so callers can start on the first file while the rest are found
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path)
+            elif entry.is_file():
+                yield entry.path
+
+def directory_manifest_hash(directory: str) -> str:
+    # Changes whenever a file under the directory is added, removed or modified,
+    # or when the chunking, embedding or index settings change, so a cached index is never stale
+    manifest = []
+    for file_path in iter_files(directory):
+        stat = os.stat(file_path)
+        manifest.append((file_path, stat.st_mtime_ns, stat.st_size))
+    manifest.sort()
+    settings = (
+        SPLITTER_VERSION, config.CHUNK_SIZE, config.CHUNK_OVERLAP, config.EMBEDDING_MODEL,
+        config.FAISS_INDEX_TYPE, config.HNSW_M, config.HNSW_EF_CONSTRUCTION,
+    )
+    return hashlib.sha256(repr((manifest, settings)).encode()).hexdigest()
+
+def _split_units(text: str, size: int):
+    # Yields (separator, unit) pairs for fast_split, where the separator joins the unit
+    # to the one before it. Units are sentences, split between words when longer than a
+    # chunk; only a single word longer than a chunk is cut into pieces
+    for paragraph in _PARAGRAPH_RE.split(text):
+        separator = "\n\n"
+        for line in paragraph.split("\n"):
+            if not line.strip():
+                continue
+            if separator != "\n\n":
+                separator = "\n"
+            for sentence in _SENTENCE_RE.split(line):
+                if len(sentence) <= size:
+                    yield separator, sentence
+                else:
+                    for word in _WORD_RE.split(sentence):
+                        if not word:
+                            continue
+                        for start in range(0, len(word), size):
+                            yield separator, word[start:start + size]
+                            separator = ""
+                        separator = " "
+                separator = " "
+
+def _join_units(window) -> str:
+    units = iter(window)
+    return next(units)[1] + "".join(separator + unit for separator, unit in units)
+
+def fast_split(text: str, size: int = 1200, overlap: int = 300):
+    # Greedily packs whole sentences into chunks of at most `size` characters,
+    # keeping paragraph and line breaks between them. Each chunk starts with the
+    # trailing units of the previous one, up to `overlap` characters. Sentences
+    # longer than a chunk are split between words.
+    chunks = []
+    window = deque()
+    length = 0  # characters in the joined window
+    for separator, unit in _split_units(text, size):
+        if window and length + len(separator) + len(unit) > size:
+            chunks.append(_join_units(window))
+            while window and (length > overlap or length + len(separator) + len(unit) > size):
+                length -= len(window.popleft()[1])
+                # The new first unit no longer needs its separator
+                length = length - len(window[0][0]) if window else 0
+        length += len(unit) + (len(separator) if window else 0)
+        window.append((separator, unit))
+    if window:
+        chunks.append(_join_units(window))
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+def split_documents(documents, size: int = 1200, overlap: int = 300):
+    # Drop-in for TextSplitter.split_documents, keeping each document's metadata
+    return [
+        Document(page_content=chunk, metadata=dict(document.metadata))
+        for document in documents
+        for chunk in fast_split(document.page_content, size, overlap)
+    ]
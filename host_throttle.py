@@ -0,0 +1,33 @@
+from typing import Dict
+import asyncio
+
+
+class HostThrottle:
+    """
+    Spaces the requests made to each host at least `interval` seconds apart.
+
+    Every caller reserves the next free slot for its host and sleeps until that
+    slot comes up. All the tasks of a crawl share one throttle, so one host sees
+    at most one request per interval however many workers are running. Requests
+    to different hosts do not wait for each other.
+    """
+
+    def __init__(self, interval: float):
+        """
+        Initialize the throttle.
+
+        Args:
+            interval: Seconds between the starts of two requests to the same host
+        """
+        self.interval = interval
+        self.next_slot: Dict[str, float] = {}  # host -> event loop time of its next free slot
+        self.lock = asyncio.Lock()
+
+    async def wait(self, host: str) -> None:
+        """Wait for the host to have a free request slot, reserving the slot after it for the next caller."""
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            start = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = start + self.interval
+        await asyncio.sleep(start - now)
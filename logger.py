@@ -1,6 +1,58 @@
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import atexit
 import os
+import queue
+import threading
+import time
+
+class DedupFilter(logging.Filter):
+    """
+    Drops a warning or error that repeats one logged within the last `interval` seconds.
+
+    Records repeat when they come from the same logger at the same level with the same
+    message template, and their arguments name the same hosts and exception types. URLs
+    on one host and the details of each exception do not count, so a dead domain or a
+    burst of rate limiting is logged once per interval rather than once per URL.
+    """
+
+    def __init__(self, interval: float = 60.0, max_messages: int = 1000):
+        super().__init__()
+        self.interval = interval
+        self.max_messages = max_messages
+        self.last_seen = OrderedDict()  # record key -> time last let through
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> tuple:
+        causes = []
+        args = record.args if isinstance(record.args, tuple) else ()
+        for arg in args:
+            if isinstance(arg, BaseException):
+                causes.append(type(arg).__name__)
+            elif isinstance(arg, str) and arg.startswith(('http://', 'https://')):
+                causes.append(urlsplit(arg).netloc)
+        if record.exc_info and record.exc_info[0] is not None:
+            causes.append(record.exc_info[0].__name__)
+        return (record.levelno, record.name, record.msg, tuple(causes))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = self._key(record)
+        now = time.monotonic()
+        with self.lock:
+            last = self.last_seen.get(key)
+            if last is not None and now - last < self.interval:
+                return False
+            self.last_seen[key] = now
+            self.last_seen.move_to_end(key)
+            if len(self.last_seen) > self.max_messages:
+                self.last_seen.popitem(last=False)
+        return True
 
 # Set up logging
 def setup_logger():
@@ -14,6 +66,9 @@ def setup_logger():
 
     logger = logging.getLogger('MyLogger')
     logger.setLevel(logging.INFO)
+    
+    # Keep a burst of identical errors from flooding the log
+    logger.addFilter(DedupFilter())
 
     # Create file handler that logs to 'my_log_file.log'
     file_handler = logging.FileHandler(LOG_FILE)
@@ -23,6 +78,13 @@ def setup_logger():
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
 
-    # Add the handler to the logger
-    logger.addHandler(file_handler)
+    # Records are queued in memory and written to the file by a background
+    # thread, so logging calls never block on disk I/O
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Add the queue handler to the logger
+    logger.addHandler(QueueHandler(log_queue))
     return logger
@@ -1,25 +1,37 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
-from helper_functions import get_embeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from helper_functions import get_embeddings, embed_queries_cached, batch_retrieve, create_faiss_index, directory_manifest_hash, iter_files, split_documents
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from chain import create_qa_chain, create_checker_chain, check_answer_type_chain
+from chain import create_answer_chain, create_checker_chain, check_answer_type_chain
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader, UnstructuredWordDocumentLoader, PyPDFLoader, JSONLoader
 from logger import setup_logger
+from semantic_cache import SemanticCache
+from embedding_cache import EmbeddingCache
+from batcher import AsyncBatcher
 import config
 import json
 import os
+import shutil
+import tempfile
+import asyncio
 import logging
 from datetime import datetime
-import traceback
-import asyncio
+from functools import lru_cache
+import time
+from cachetools import LRUCache
+from threading import Lock
+import anyio
 from concurrent.futures import ThreadPoolExecutor
 import uvicorn
+import faiss
 
 load_dotenv()
 
@@ -45,15 +57,14 @@ except Exception as e:
     logger = logging.getLogger('Fallback')
     logger.warning(f"Using fallback logger due to error: {str(e)}")
 
-# Configure thread pool for concurrent processing
+# Size of the thread pool queries are processed in (shared with FastAPI's own threadpool)
 MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))  # Default to 4 workers
-executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
-logger.info(f"Configured thread pool with {MAX_WORKERS} workers")
 
 logger.info("Starting the application")
 app = FastAPI(title="DMCC Policy Search API", 
               description="API for searching policies using RAG with LLM", 
-              version="1.0.0")
+              version="1.0.0",
+              default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -66,8 +77,10 @@ app.add_middleware(
 
 # Initialize global variables
 vectorstore = None
-conversation_chain = None
+answer_chain = None
+index_key = None  # manifest hash of the documents the vectorstore was built from
 directory = config.DIRECTORY
+semantic_cache = SemanticCache(max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES, ttl=config.SEMANTIC_CACHE_TTL)
 
 class QueryRequest(BaseModel):
     query: str
@@ -84,98 +97,263 @@ def initialize_llm():
 
 def create_vectorstore(docs):
     logger.info(f"Creating vectorstore with {len(docs)} documents")
-    logger.info(f"First two documents: {docs}")
     embeddings = get_embeddings()
-    vectorstore = FAISS.from_documents(docs, embeddings)
+    texts = [doc.page_content for doc in docs]
+    # Only chunks not embedded by a previous run are sent to the API, in concurrent batches.
+    # Normalized vectors make inner product equal to cosine similarity
+    vectors = EmbeddingCache(
+        config.EMBEDDING_CACHE_PATH,
+        batch_size=config.EMBEDDING_BATCH_SIZE,
+        concurrency=config.EMBEDDING_CONCURRENCY,
+    ).get_or_compute(texts, embeddings)
+    faiss.normalize_L2(vectors)
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=create_faiss_index(vectors),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+    vectorstore.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in docs])
     logger.info("Vectorstore created successfully")
     return vectorstore
 
-def get_chains(vectorstore):
-    logger.info("Creating conversation chain")
+def load_or_create_vectorstore(directory, manifest_hash):
+    # Reuse the index built for the same set of files instead of re-embedding every chunk
+    cache_path = os.path.join(config.VECTORSTORE_CACHE_DIR, f"faiss_{manifest_hash}")
+    if os.path.exists(os.path.join(cache_path, "index.faiss")):
+        logger.info(f"Loading cached vectorstore from {cache_path}")
+        vectorstore = FAISS.load_local(
+            cache_path,
+            get_embeddings(),
+            allow_dangerous_deserialization=True,  # the pickle was written by this application
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+        if hasattr(vectorstore.index, "hnsw"):
+            vectorstore.index.hnsw.efSearch = config.HNSW_EF_SEARCH
+        return vectorstore
+
+    docs = get_text_chunks(directory)
+    logger.info(f"Total documents loaded: {len(docs)}")
+    if not docs:
+        return None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"First few documents: {docs[:2]}")
+    vectorstore = create_vectorstore(docs)
+
+    # Write to a temporary directory and rename it into place so a crash never
+    # leaves a half-written index behind
+    os.makedirs(config.VECTORSTORE_CACHE_DIR, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=config.VECTORSTORE_CACHE_DIR)
+    try:
+        vectorstore.save_local(tmp_path)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"Saved vectorstore to {cache_path}")
+    except OSError as e:
+        logger.warning(f"Could not save vectorstore to {cache_path}: {str(e)}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return vectorstore
+
+def get_chains():
+    # Retrieval is done per batch in prepare_queries, so the chain only answers from the retrieved documents
+    logger.info("Creating answer chain")
     llm = initialize_llm()
-    chain = create_qa_chain(llm, vectorstore)
+    chain = create_answer_chain(llm)
     return chain
 
+# Document loader factory for each supported file extension
+LOADERS = {
+    # Use UTF-8 encoding with error handling strategy
+    '.txt': lambda path: TextLoader(path, encoding='utf-8', autodetect_encoding=True),
+    '.pdf': PyPDFLoader,
+    '.docx': UnstructuredWordDocumentLoader,
+    '.json': lambda path: JSONLoader(file_path=path, jq_schema='.', text_content=False),
+}
+
+def _load_and_split(file_path):
+    # Runs in a worker thread; errors are logged so one bad file does not stop the others
+    logger.info(f"Processing file: {file_path}")
+    try:
+        loader_factory = LOADERS.get(os.path.splitext(file_path)[1].lower())
+        if loader_factory is None:
+            logger.warning(f"Skipping unsupported file: {file_path}")
+            return []
+        
+        loader = loader_factory(file_path)
+        document = loader.load()
+        logger.info(f"Loaded document from {file_path}")
+        
+        doc_chunks = split_documents(document, config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+        logger.info(f"Split {file_path} into {len(doc_chunks)} chunks")
+        return doc_chunks
+    except Exception as e:
+        logger.exception(f"Error processing file {file_path}: {str(e)}")
+        return []
+
 def get_text_chunks(directory):
     logger.info(f"Processing documents in directory: {directory}")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=300, length_function=len)
+    # Load and split files in parallel, starting as soon as the first file is found;
+    # map keeps the chunks in directory order
     chunks = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            logger.info(f"Processing file: {file_path}")
-            try:
-                if file.endswith('.txt'):
-                    # Use UTF-8 encoding with error handling strategy
-                    loader = TextLoader(file_path, encoding='utf-8', autodetect_encoding=True)
-                elif file.endswith('.pdf'):
-                    loader = PyPDFLoader(file_path)
-                elif file.endswith('.docx'):
-                    loader = UnstructuredWordDocumentLoader(file_path)
-                elif file.endswith('.json'):
-                    loader = JSONLoader(
-                        file_path=file_path,
-                        jq_schema='.',
-                        text_content=False
-                    )
-                else:
-                    logger.warning(f"Skipping unsupported file: {file_path}")
-                    continue
-                
-                document = loader.load()
-                logger.info(f"Loaded document from {file_path}")
-                
-                doc_chunks = text_splitter.split_documents(document)
-                logger.info(f"Split {file_path} into {len(doc_chunks)} chunks")
-                chunks.extend(doc_chunks)
-            except Exception as e:
-                logger.error(f"Error processing file {file_path}: {str(e)}")
-                logger.error(traceback.format_exc())
-                continue
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as loader_pool:
+        for doc_chunks in loader_pool.map(_load_and_split, iter_files(directory)):
+            chunks.extend(doc_chunks)
     
     logger.info(f"Processed {len(chunks)} total chunks from all documents")
     return chunks
 
-# Function to process a query with the RAG system
-def process_query(query: str):
+# Answers to exact repeats of a (normalized) query on the same day, keyed by (query, date)
+query_cache = LRUCache(maxsize=config.QUERY_CACHE_SIZE)
+query_cache_lock = Lock()
+
+class PendingAnswer:
+    """A query that missed both caches, with its retrieved documents, waiting for its LLM call."""
+
+    def __init__(self, query, query_key, query_embedding, docs, current_date):
+        self.query = query
+        self.query_key = query_key
+        self.query_embedding = query_embedding
+        self.docs = docs
+        self.current_date = current_date
+        # Set by the first caller to await the answer, shared with callers asking the same question
+        self.task = None
+
+def _batched(fn, items):
+    # Runs fn on the whole batch; if that fails, retries each item alone so one bad
+    # query only fails its own caller
+    try:
+        return fn(items)
+    except Exception:
+        results = []
+        for item in items:
+            try:
+                results.append(fn([item])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+# Function to prepare a batch of queries with the RAG system
+def prepare_queries(queries):
+    # Does the work shared by a batch: exact cache lookups, then one embedding call, one
+    # semantic cache search and one index search for the rest. Returns, per query, its
+    # answer, the Exception it failed with, or a PendingAnswer still needing its LLM call
     current_date = datetime.now().strftime("%Y-%m-%d")
-    response = conversation_chain.invoke({
-        "input": query,
-        "current_date": [SystemMessage(content=current_date)],
+    # Repeats of the same question (ignoring case and whitespace) on the same day
+    # are answered from memory without embedding or retrieval
+    query_keys = [" ".join(query.lower().split()) for query in queries]
+    # The normalized key is only for the exact cache; embedding and the chain get the query
+    # as typed (case matters for acronyms and tickers), from the first caller asking it
+    original_queries = {}
+    for query_key, query in zip(query_keys, queries):
+        original_queries.setdefault(query_key, query)
+    results = {}
+    with query_cache_lock:
+        for query_key in query_keys:
+            if (query_key, current_date) in query_cache:
+                results[query_key] = query_cache[(query_key, current_date)]
+
+    pending = [query_key for query_key in dict.fromkeys(query_keys) if query_key not in results]
+    if pending:
+        # One embedding per query, made in a single call, serves both the semantic cache and retrieval
+        vectors = dict(zip(pending, _batched(embed_queries_cached, [original_queries[query_key] for query_key in pending])))
+        for query_key in pending:
+            if isinstance(vectors[query_key], Exception):
+                logger.error(f"Error embedding query '{query_key[:50]}...': {str(vectors[query_key])}")
+                results[query_key] = vectors[query_key]
+        pending = [query_key for query_key in pending if query_key not in results]
+
+    if pending:
+        # Reuse the answer of a semantically equivalent earlier question asked against
+        # the same documents on the same day, if there is one
+        cached_responses = semantic_cache.get_many(
+            [vectors[query_key] for query_key in pending],
+            tau=config.SEMANTIC_CACHE_THRESHOLD,
+            scope=(index_key, current_date),
+        )
+        for query_key, cached_response in zip(pending, cached_responses):
+            if cached_response is not None:
+                logger.info(f"Semantic cache hit for query: '{query_key[:50]}...'")
+                results[query_key] = cached_response
+        pending = [query_key for query_key in pending if query_key not in results]
+
+    if pending:
+        retrieved = _batched(
+            lambda query_vectors: batch_retrieve(
+                vectorstore, query_vectors, config.RETRIEVER_SEARCH_TYPE, config.RETRIEVER_K, config.RETRIEVER_FETCH_K,
+            ),
+            [vectors[query_key] for query_key in pending],
+        )
+        for query_key, docs in zip(pending, retrieved):
+            if isinstance(docs, Exception):
+                logger.error(f"Error retrieving documents for query '{query_key[:50]}...': {str(docs)}")
+                results[query_key] = docs
+            else:
+                results[query_key] = PendingAnswer(original_queries[query_key], query_key, vectors[query_key], docs, current_date)
+    return [results[query_key] for query_key in query_keys]
+
+def answer_query(pending):
+    # Each query gets its own LLM call and prompt, so answers never mix context between users
+    rag_response = answer_chain.invoke({
+        "input": pending.query,
+        "context": pending.docs,
+        "current_date": [SystemMessage(content=pending.current_date)],
     })
-    rag_response = response['answer']
-    logger.info(f"Generated response for query: '{query[:50]}...'")
+    semantic_cache.put(pending.query_embedding, rag_response, scope=(index_key, pending.current_date))
+    with query_cache_lock:
+        query_cache[(pending.query_key, pending.current_date)] = rag_response
+    logger.info(f"Generated response for query: '{pending.query_key[:50]}...'")
     return rag_response
 
+# Concurrent /generate requests are coalesced into batches for prepare_queries
+query_batcher = AsyncBatcher(
+    lambda queries: run_in_threadpool(prepare_queries, queries),
+    max_batch=config.QUERY_BATCH_SIZE,
+    max_wait_ms=config.QUERY_BATCH_WAIT_MS,
+)
+
 # Initialize the application on startup
 @app.on_event("startup")
 async def startup_event():
-    global vectorstore, conversation_chain
+    global vectorstore, answer_chain, index_key
     try:
         logger.info("Initializing application on startup")
-        docs = get_text_chunks(directory)
-        logger.info(f"Total documents loaded: {len(docs)}")
-        if docs:
-            logger.info(f"First few documents: {docs[:2]}")
-            vectorstore = create_vectorstore(docs)
-            conversation_chain = get_chains(vectorstore)
+        anyio.to_thread.current_default_thread_limiter().total_tokens = MAX_WORKERS
+        logger.info(f"Configured thread pool with {MAX_WORKERS} workers")
+        query_batcher.start()
+        
+        # Warm up the shared embeddings client queries are embedded with, so the
+        # first request does not pay for connection setup
+        try:
+            await run_in_threadpool(get_embeddings().embed_query, "warmup")
+        except Exception as e:
+            logger.warning(f"Embeddings warmup failed: {str(e)}")
+        
+        # Cached answers are only reused for the same documents on the same day
+        index_key = directory_manifest_hash(directory)
+        if semantic_cache.load(config.SEMANTIC_CACHE_DIR, scope=(index_key, datetime.now().strftime("%Y-%m-%d"))):
+            logger.info(f"Loaded {len(semantic_cache.entries)} cached answers from {config.SEMANTIC_CACHE_DIR}")
+        vectorstore = load_or_create_vectorstore(directory, index_key)
+        if vectorstore is not None:
+            faiss.omp_set_num_threads(config.FAISS_THREADS)
+            logger.info(f"FAISS using {config.FAISS_THREADS} threads")
+            answer_chain = get_chains()
             logger.info("Application initialization complete")
         else:
             logger.warning("No documents were loaded. Check data directory and file formats.")
     except Exception as e:
-        logger.critical(f"Failed to initialize application: {str(e)}\n{traceback.format_exc()}")
+        logger.critical(f"Failed to initialize application: {str(e)}", exc_info=True)
         raise
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("Shutting down thread pool executor")
-    executor.shutdown(wait=True)
+    await query_batcher.stop()
+    semantic_cache.save(config.SEMANTIC_CACHE_DIR)
     logger.info("Application shutdown complete")
 
 @app.post("/generate", response_model=dict)
 async def generate(request: QueryRequest):
     try:
-        global conversation_chain
+        global answer_chain
         query = request.query
         logger.info(f"Received query: '{query[:50]}...'")
         
@@ -183,35 +361,54 @@ async def generate(request: QueryRequest):
             logger.error("Empty query received")
             raise HTTPException(status_code=400, detail="Query is required")
         
-        if conversation_chain is None:
-            logger.error("Conversation chain not initialized")
+        if answer_chain is None:
+            logger.error("Answer chain not initialized")
             raise HTTPException(status_code=500, detail="System not properly initialized")
         
-        # Submit query to thread pool for concurrent processing
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(executor, process_query, query)
+        # Submit query to be batched with other concurrent queries
+        result = await query_batcher.submit(query)
+        if isinstance(result, PendingAnswer):
+            # The LLM call runs on its own, so no caller waits for the slowest query in its batch
+            if result.task is None:
+                result.task = asyncio.ensure_future(run_in_threadpool(answer_query, result))
+            result = await asyncio.shield(result.task)
         
         return {"answer": result}
             
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}\n{traceback.format_exc()}")
+        logger.exception(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@app.post("/cache/clear")
+async def clear_cache():
+    with query_cache_lock:
+        query_cache.clear()
+    semantic_cache.clear()
+    # Also drop the saved answers, so a restart does not bring them back
+    await run_in_threadpool(semantic_cache.save, config.SEMANTIC_CACHE_DIR)
+    logger.info("Cleared query and semantic caches")
+    return {"status": "cleared"}
+
+@lru_cache(maxsize=1)
+def _health_timestamp(second: int):
+    # Formatted once per second however often the health check is probed
+    return datetime.fromtimestamp(second).isoformat()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": _health_timestamp(int(time.time()))}
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail},
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unexpected error: {str(exc)}\n{traceback.format_exc()}")
-    return JSONResponse(
+    logger.error(f"Unexpected error: {str(exc)}", exc_info=exc)
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error", "details": str(exc)},
     )
@@ -12,6 +12,8 @@ def main():
                       help="Delay between requests in seconds (default: 1.5)")
     parser.add_argument("--output", type=str, default="./data",
                       help="Output directory for data (default: ./data)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                      help="Number of pages fetched at once (default: 8)")
     args = parser.parse_args()
 
     logger.info(f"Starting extraction from {args.url} with max depth {args.depth}")
@@ -20,12 +22,13 @@ def main():
         base_url=args.url,
         max_depth=args.depth,
         delay=args.delay,
-        output_dir=args.output
+        output_dir=args.output,
+        concurrency=args.concurrency
     )
     
     all_text = extractor.extract_all_text()
     
-    logger.info(f"Extraction complete. Processed {len(extractor.visited_urls)} URLs and extracted text from {len(all_text)} pages.")
+    logger.info(f"Extraction complete. Processed {len(extractor.visited_fingerprints)} URLs and extracted text from {len(all_text)} pages.")
     logger.info(f"Results saved to {args.output}")
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import faiss
+import numpy as np
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+import os
+import pickle
+import threading
+import time
+
+
+class SemanticCache:
+    """
+    Cache of generated answers keyed by the embedding of the question.
+
+    A lookup returns a cached answer when a previous question is similar enough
+    (cosine similarity over L2-normalized vectors in a FAISS inner-product index).
+    Entries expire after a TTL and the least recently used entry is evicted once
+    the cache is full. Answers are only valid in the scope they were generated in
+    (such as the document index and date), so the cache is emptied whenever a
+    lookup or insert comes from a different scope.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 24 * 60 * 60):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of answers to keep (default: 10000)
+            ttl: Seconds before a cached answer expires (default: 1 day)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # Created on first insert, once the embedding dimension is known
+        self.index: Optional[faiss.IndexIDMap2] = None
+
+        # Entry id -> (answer, created_at), ordered from least to most recently used
+        self.entries: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+        self.next_id = 0
+        self.scope: Optional[Hashable] = None
+
+        # Queries are answered from a thread pool
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        """Return one embedding or a sequence of them as normalized float32 row vectors."""
+        vector = np.array(embedding, dtype=np.float32)
+        vector = vector.reshape(-1, vector.shape[-1])
+        faiss.normalize_L2(vector)
+        return vector
+
+    def get_many(self, embeddings: Sequence[Sequence[float]], tau: float = 0.92,
+                 scope: Hashable = None) -> List[Optional[str]]:
+        """Return the cached answer for the most similar question to each one, or None if below tau, in a single index search."""
+        vectors = self._normalize(embeddings)
+        with self.lock:
+            self._enter_scope(scope)
+            if self.index is None or self.index.ntotal == 0:
+                return [None] * len(vectors)
+
+            answers: List[Optional[str]] = []
+            scores, ids = self.index.search(vectors, 1)
+            for score, entry_id in zip(scores[:, 0], ids[:, 0]):
+                score, entry_id = float(score), int(entry_id)
+                # An entry may have expired for an earlier question in the same lookup
+                if entry_id < 0 or score < tau or entry_id not in self.entries:
+                    answers.append(None)
+                    continue
+
+                answer, created_at = self.entries[entry_id]
+                if time.time() - created_at > self.ttl:
+                    self._remove(entry_id)
+                    answers.append(None)
+                    continue
+
+                self.entries.move_to_end(entry_id)
+                answers.append(answer)
+            return answers
+
+    def put(self, embedding: Sequence[float], answer: str, scope: Hashable = None) -> None:
+        """Cache an answer under the embedding of its question."""
+        vector = self._normalize(embedding)
+        with self.lock:
+            self._enter_scope(scope)
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+            entry_id = self.next_id
+            self.next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self.entries[entry_id] = (answer, time.time())
+
+            # Evict the least recently used entry once full
+            if len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self.lock:
+            self.index = None
+            self.entries.clear()
+
+    def _enter_scope(self, scope: Hashable) -> None:
+        """Drop every entry if they belong to another scope. Callers must hold the lock."""
+        if scope != self.scope:
+            self.index = None
+            self.entries.clear()
+            self.scope = scope
+
+    def _remove(self, entry_id: int) -> None:
+        """Remove a single entry. Callers must hold the lock."""
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        del self.entries[entry_id]
+
+    def save(self, path: str) -> None:
+        """Persist the cache to a directory. Saving an empty cache removes the saved one."""
+        index_path = os.path.join(path, "index.faiss")
+        entries_path = os.path.join(path, "entries.pkl")
+        with self.lock:
+            if self.index is None or not self.entries:
+                for file_path in (index_path, entries_path):
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                return
+
+            # Each file is written to a temporary name and renamed into place so a
+            # crash never leaves a half-written cache behind
+            os.makedirs(path, exist_ok=True)
+            faiss.write_index(self.index, index_path + ".tmp")
+            with open(entries_path + ".tmp", "wb") as f:
+                pickle.dump((self.entries, self.next_id, self.scope), f)
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(entries_path + ".tmp", entries_path)
+
+    def load(self, path: str, scope: Hashable = None) -> bool:
+        """Load a cache saved with save(). Returns False if there is nothing to load for this scope."""
+        index_path = os.path.join(path, "index.faiss")
+        entries_path = os.path.join(path, "entries.pkl")
+        if not (os.path.exists(index_path) and os.path.exists(entries_path)):
+            return False
+
+        with open(entries_path, "rb") as f:
+            saved = pickle.load(f)
+        # Answers saved for another document index or date are not loaded
+        if len(saved) != 3 or saved[2] != scope:
+            return False
+
+        with self.lock:
+            self.index = faiss.read_index(index_path)
+            self.entries, self.next_id, self.scope = saved
+        return True
@@ -1,13 +1,16 @@
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import asyncio
+from lxml import etree
+from logger import DedupFilter
 from urllib.parse import urljoin, urlparse
 import re
-from typing import List, Set
-import time
+from typing import Iterator, List, Optional, Set, TextIO
 import os
 from pathlib import Path
 import logging
 import argparse
+from collections import deque
+from host_throttle import HostThrottle
 
 # Set up logging
 logging.basicConfig(
@@ -16,26 +19,43 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 logger = logging.getLogger(__name__)
+logger.addFilter(DedupFilter())
+
+# Transient failures (gateway errors, dropped connections) are retried with exponential backoff
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3  # seconds, doubled on each attempt
+RETRY_STATUSES = {502, 503, 504}
+
+# Response bodies are fed to the link parser in chunks of this many bytes as they arrive
+READ_CHUNK_SIZE = 16384
 
 class WebsiteURLExtractor:
-    def __init__(self, base_url: str, max_depth: int = 5, delay: float = 1.0, output_dir: str = "./data"):
+    def __init__(self, base_url: str, max_depth: int = 5, delay: float = 1.0, output_dir: str = "./data",
+                 concurrency: int = 8):
         """
         Initialize the website URL extractor.
         
         Args:
             base_url: The starting URL to crawl (e.g., "https://www.angelone.in/support")
             max_depth: How many levels deep to follow links (default: 5)
-            delay: Seconds to wait between requests (default: 1.0)
+            delay: Seconds to wait between requests to the same host (default: 1.0)
             output_dir: Directory to save extracted URLs (default: "./data")
+            concurrency: Number of pages fetched at once (default: 8)
         """
         self.base_url = base_url
         self.max_depth = max_depth
         self.delay = delay
+        self.concurrency = concurrency
+        # Requests to a host start at least delay seconds apart however many workers are running
+        self.throttle = HostThrottle(delay)
         self.visited_urls: Set[str] = set()
         self.parsed_domain = urlparse(base_url)
         self.domain = self.parsed_domain.netloc
         self.base_path = self.parsed_domain.path
         
+        # Links are in scope when they start with the domain and base path
+        self.allowed_prefixes = tuple(f"{scheme}://{self.domain}{self.base_path}" for scheme in ('http', 'https'))
+        
         # Ensure output directory exists
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -49,11 +69,13 @@ class WebsiteURLExtractor:
             'Upgrade-Insecure-Requests': '1'
         }
         
-        # Track pages to visit
-        self.to_visit: List = [(self.base_url, 0)]  # (url, depth)
+        # Track pages to visit; URLs are only queued once, from the first (shallowest) page linking to them
+        self.to_visit: deque = deque([(self.base_url, 0)])  # (url, depth)
+        self.enqueued_urls: Set[str] = {self.base_url}
         
         # Results storage
         self.extracted_urls: List[str] = []
+        self.extracted_file: Optional[TextIO] = None  # open while crawling, URLs are appended as they are found
     
     def extract_all_urls(self) -> List[str]:
         """
@@ -62,64 +84,140 @@ class WebsiteURLExtractor:
         Returns:
             List of discovered URLs
         """
-        # Use breadth-first search to crawl the website
-        while self.to_visit:
-            url, depth = self.to_visit.pop(0)
-            
-            if url in self.visited_urls or depth > self.max_depth:
-                continue
-                
-            self._process_url(url, depth)
-            
-            # Save progress after every 10 URLs
-            if len(self.extracted_urls) % 10 == 0:
-                self._save_progress()
+        return asyncio.run(self._extract_async())
+    
+    async def _extract_async(self) -> List[str]:
+        """Crawl breadth-first, fetching the pages of each depth level concurrently."""
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, keepalive_timeout=60)
+        
+        # Extracted URLs are appended to the file as they are found
+        with open(self.output_dir / "extracted_urls.txt", "w", encoding="utf-8") as self.extracted_file:
+            async with aiohttp.ClientSession(connector=connector, headers=self.headers) as session:
+                # Levels are crawled one at a time so every URL keeps its breadth-first depth.
+                # Links found on this level are queued in to_visit for the next one.
+                while self.to_visit:
+                    queue: asyncio.Queue = asyncio.Queue()
+                    while self.to_visit:
+                        queue.put_nowait(self.to_visit.popleft())
+                    
+                    workers = [asyncio.create_task(self._worker(session, queue)) for _ in range(self.concurrency)]
+                    await queue.join()
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
             
         # Final save
         self._save_progress()
         return self.extracted_urls
     
-    def _process_url(self, url: str, depth: int) -> None:
+    async def _worker(self, session: aiohttp.ClientSession, queue: asyncio.Queue) -> None:
+        """Process URLs from the queue until cancelled."""
+        while True:
+            url, depth = await queue.get()
+            try:
+                if url in self.visited_urls or depth > self.max_depth:
+                    continue
+                
+                await self._process_url(session, url, depth)
+            finally:
+                queue.task_done()
+    
+    async def _process_url(self, session: aiohttp.ClientSession, url: str, depth: int) -> None:
         """Process a single URL and find links."""
         if url in self.visited_urls:
             return
             
         # Respect crawl delay
-        time.sleep(self.delay)
+        await self.throttle.wait(urlparse(url).netloc)
         
         try:
-            logger.info(f"Processing: {url} (depth: {depth})")
-            response = requests.get(url, headers=self.headers, timeout=15)
-            
-            # Mark as visited even if there's an error
-            self.visited_urls.add(url)
-            
-            # Add to extracted URLs if successful
-            if response.status_code == 200:
-                self.extracted_urls.append(url)
-            else:
-                logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
-                return
-                
-            # Check content type
-            content_type = response.headers.get('Content-Type', '')
-            if 'text/html' not in content_type.lower():
-                logger.warning(f"Skipping non-HTML content at {url}: {content_type}")
+            logger.info("Processing: %s (depth: %s)", url, depth)
+            hrefs = await self._fetch(session, url)
+            if hrefs is None:
                 return
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
             
-            # Find all links on the page
-            self._find_links(soup, url, depth)
+            # Queue the links found on the page
+            self._find_links(hrefs, url, depth)
                 
         except Exception as e:
-            logger.error(f"Error processing {url}: {str(e)}")
+            logger.error("Error processing %s: %s", url, e)
     
-    def _find_links(self, soup: BeautifulSoup, current_url: str, current_depth: int) -> None:
-        """Find all links on the page and add valid ones to the to_visit list."""
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[List[str]]:
+        """Fetch a URL, retrying transient failures. Returns the page's link targets, or None if there are none to follow."""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                        logger.warning("Retrying %s after HTTP %s", url, response.status)
+                        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+                        continue
+                    
+                    # Mark as visited even if there's an error
+                    self.visited_urls.add(url)
+                    
+                    if response.status != 200:
+                        logger.warning("Failed to fetch %s: HTTP %s", url, response.status)
+                        return None
+                        
+                    # Check content type
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'text/html' not in content_type.lower():
+                        self._record_extracted(url)
+                        logger.warning("Skipping non-HTML content at %s: %s", url, content_type)
+                        return None
+                    
+                    # Add to extracted URLs only once the body has been read, so a
+                    # retry after a failed read does not list the URL twice
+                    hrefs = await self._read_links(response)
+                    self._record_extracted(url)
+                    return hrefs
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                logger.warning("Retrying %s after error: %s", url, e)
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+        return None
+    
+    def _record_extracted(self, url: str) -> None:
+        """Add a successfully fetched URL to the extracted URLs."""
+        self.extracted_urls.append(url)
+        self.extracted_file.write(f"{url}\n")
+    
+    async def _read_links(self, response: aiohttp.ClientResponse) -> List[str]:
+        """Stream the body into an incremental HTML parser, collecting <a href> targets as chunks arrive."""
+        parser = etree.HTMLPullParser(events=('end',), encoding=response.charset)
+        hrefs: List[str] = []
+        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+            parser.feed(chunk)
+            hrefs.extend(self._drain_links(parser))
+        
+        try:
+            parser.close()
+        except etree.XMLSyntaxError:
+            # Raised for an empty body
+            return hrefs
+        hrefs.extend(self._drain_links(parser))
+        return hrefs
+    
+    @staticmethod
+    def _drain_links(parser: etree.HTMLPullParser) -> Iterator[str]:
+        """
+        Yield the href of each <a> parsed so far, freeing every element once read.
+        
+        Each finished element is cleared and its already processed siblings are
+        deleted, so the parsed tree stays small however long the page is.
+        """
+        for _, element in parser.read_events():
+            href = element.get('href') if element.tag == 'a' else None
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if href is not None:
+                yield href
+    
+    def _find_links(self, hrefs: List[str], current_url: str, current_depth: int) -> None:
+        """Add the valid links found on the page to the to_visit list."""
+        for href in hrefs:
             # Skip empty, javascript, and anchor links
             if not href or href.startswith('javascript:') or href.startswith('#'):
                 continue
@@ -129,42 +227,38 @@ class WebsiteURLExtractor:
             
             # Only process URLs that belong to our target domain and path
             if self._should_process_url(next_url):
-                # Add to visit queue if not already visited
-                if next_url not in self.visited_urls:
+                # Add to visit queue if not already visited or queued
+                if next_url not in self.visited_urls and next_url not in self.enqueued_urls:
+                    self.enqueued_urls.add(next_url)
                     self.to_visit.append((next_url, current_depth + 1))
     
     def _should_process_url(self, url: str) -> bool:
         """Determine if a URL should be processed based on domain and path."""
-        parsed = urlparse(url)
-        
-        # Must be same domain
-        if parsed.netloc != self.domain:
-            return False
-            
-        # Must start with the base path
-        if not parsed.path.startswith(self.base_path):
+        # Must be same domain and start with the base path
+        if not url.startswith(self.allowed_prefixes):
             return False
+        
+        # Without a base path, make sure the prefix did not match a longer host name
+        if not self.base_path:
+            rest = url[url.index(self.domain) + len(self.domain):]
+            if rest and rest[0] not in '/?#':
+                return False
             
         # Skip URLs with fragments or queries if the base URL is already visited
-        base_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-        if base_url in self.visited_urls and (parsed.fragment or parsed.query):
+        base_url = url.split('#', 1)[0].split('?', 1)[0]
+        if base_url != url and base_url in self.visited_urls:
             return False
             
         return True
     
     def _save_progress(self) -> None:
-        """Save discovered URLs to a file."""
-        # Save the list of extracted URLs
-        with open(self.output_dir / "extracted_urls.txt", "w", encoding="utf-8") as f:
-            for url in self.extracted_urls:
-                f.write(f"{url}\n")
-        
+        """Save visited URLs to a file. Extracted URLs are written as they are found."""
         # Save visited URLs (including failed ones)
         with open(self.output_dir / "visited_urls.txt", "w", encoding="utf-8") as f:
             for url in sorted(self.visited_urls):
                 f.write(f"{url}\n")
                 
-        logger.info(f"Saved {len(self.extracted_urls)} URLs to {self.output_dir / 'extracted_urls.txt'}")
+        logger.info("Saved %s URLs to %s", len(self.extracted_urls), self.output_dir / 'extracted_urls.txt')
 
 
 def main():
@@ -177,21 +271,24 @@ def main():
                       help="Delay between requests in seconds (default: 1.5)")
     parser.add_argument("--output", type=str, default="./data",
                       help="Output directory for data (default: ./data)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                      help="Number of pages fetched at once (default: 8)")
     args = parser.parse_args()
 
-    logger.info(f"Starting URL extraction from {args.url} with max depth {args.depth}")
+    logger.info("Starting URL extraction from %s with max depth %s", args.url, args.depth)
     
     extractor = WebsiteURLExtractor(
         base_url=args.url,
         max_depth=args.depth,
         delay=args.delay,
-        output_dir=args.output
+        output_dir=args.output,
+        concurrency=args.concurrency
     )
     
     all_urls = extractor.extract_all_urls()
     
-    logger.info(f"Extraction complete. Processed {len(extractor.visited_urls)} URLs and extracted {len(all_urls)} valid URLs.")
-    logger.info(f"Results saved to {args.output}/extracted_urls.txt")
+    logger.info("Extraction complete. Processed %s URLs and extracted %s valid URLs.", len(extractor.visited_urls), len(all_urls))
+    logger.info("Results saved to %s/extracted_urls.txt", args.output)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
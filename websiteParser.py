@@ -1,13 +1,19 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import aiohttp
+import asyncio
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer, Tag
+from urllib.parse import ParseResult, urljoin, urlparse, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
 import re
-from typing import List, Dict, Set, Optional, Tuple
-import time
+from typing import Iterator, List, Dict, Set, Optional, TextIO, Tuple
 import os
 import json
 from pathlib import Path
+from functools import lru_cache
 import logging
+from logger import DedupFilter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from host_throttle import HostThrottle
 
 # Set up logging
 logging.basicConfig(
@@ -16,23 +22,300 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 logger = logging.getLogger(__name__)
+logger.addFilter(DedupFilter())
+
+# Transient failures (gateway errors, dropped connections) are retried with exponential backoff
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3  # seconds, doubled on each attempt
+RETRY_STATUSES = {502, 503, 504}
+
+# Pages are appended to the text and JSONL outputs as they are extracted;
+# the full JSON and visited list are rewritten every this many pages
+SAVE_INTERVAL = 50
+
+# Elements that never carry page content
+_UNWANTED_ELEMENTS = [
+    'script', 'style', 'meta', 'link', 'noscript', 'iframe',
+    '[style*="display:none"]', '[style*="display: none"]'
+]
+
+# AngelOne-specific selectors (based on inspection of the site structure)
+_ANGELONE_SELECTORS = [
+    '.open-account-area', '.download-app-area', '.sip-calc-area',
+    '.search-area', '.top-nav', '.main-nav', '.primary-nav',
+    '.footer-top', '.footer-bottom', '.copyright-area',
+    '.login-area', '.quick-links', '.popular-stocks',
+    '.mobile-menu', '.mobile-nav', '.pricing-section',
+    'nav', '[id*="menu"]', '[class*="menu"]',
+    '.open-account-btn', '.login-btn', '.download-section',
+    '.user-links', '.open-demat', '.quick-links',
+    '.popular-links', '.attention-investors',
+    '.open-free-demat-account', '.oda-footer',
+    'form', '.social-links',
+    # Additional AngelOne specific selectors for common elements
+    '.we-are-here-to-help-you', '.quick-links-10', 
+    '.connect-with-us', '.partnership-request', '.media-queries',
+    '.en', '.hi'
+]
+
+# Only the title and body are built into the tree; the rest of <head> is skipped while parsing
+_PAGE_STRAINER = SoupStrainer(['title', 'body'])
+
+# Headings (h1 is usually handled as title) and paragraph-like elements, collected in one walk
+_HEADING_TAGS = {'h2', 'h3', 'h4', 'h5', 'h6'}
+_PARAGRAPH_TAGS = {'p', 'li', 'section'}
+_TEXT_TAGS = list(_HEADING_TAGS | _PARAGRAPH_TAGS)
+
+# Text that marks navigation or call-to-action blocks (matched case-insensitively)
+_FALLBACK_NAV_WORDS = [
+    'login', 'sign up', 'open account', 'download', 'download app', 
+    'register', 'create account', 'quick links', 'we are here to help you',
+    'connect with us', 'partnership request', 'media queries'
+]
+_HEADING_NAV_WORDS = ['menu', 'navigation', 'login', 'download', 'open demat']
+_PARAGRAPH_NAV_WORDS = ['login', 'signup', 'sign up', 'download', 'cookie', 'privacy', 'open demat', 'download app']
+
+# Sections that appear on every page (matched case-sensitively)
+_COMMON_PHRASES = [
+    "We are here to help you", "Quick Links", "Track Application Status",
+    "Want to connect with us?", "Connect with us", "Partnership Request", 
+    "Media Queries", "Our experts will be happy to assist you",
+    "Still have any queries?", "Connect with our support team", 
+    "For any partnership requests please reach us at", "EMAIL US",
+    "partners@angelbroking.com", "Learn More", "Create Ticket",
+    "022-40003600", "CONTACT US"
+]
+
+# Each word list is matched in a single pass by one alternation
+_FALLBACK_NAV_RE = re.compile("|".join(map(re.escape, _FALLBACK_NAV_WORDS)), re.I)
+_HEADING_NAV_RE = re.compile("|".join(map(re.escape, _HEADING_NAV_WORDS)), re.I)
+_PARAGRAPH_NAV_RE = re.compile("|".join(map(re.escape, _PARAGRAPH_NAV_WORDS)), re.I)
+_COMMON_PHRASES_RE = re.compile("|".join(map(re.escape, _COMMON_PHRASES)))
+
+# Precompiled patterns used while cleaning every page
+_MAIN_ID_RE = re.compile(r'(main|content|article|post)', re.I)
+_TITLE_SUFFIX_RE = re.compile(r'\s*[\-\|]\s*.+$')
+_WS_MULTI_NL = re.compile(r'\n\s*\n')
+_WS_SPACES_OR_SINGLE_NL = re.compile(r' {2,}|(?<!\n)\n(?!\n)')
+_NON_EMPTY_LINE_RE = re.compile(r'[^\n]+')
+
+# The same links appear on many pages, so URL parsing and joining are memoized
+@lru_cache(maxsize=65536)
+def _cached_urlparse(url: str) -> ParseResult:
+    return urlparse(url)
+
+@lru_cache(maxsize=65536)
+def _cached_urljoin(base: str, url: str) -> str:
+    return urljoin(base, url)
+
+@lru_cache(maxsize=65536)
+def _canonicalize_url(url: str) -> str:
+    """Lowercase the scheme and host and drop the fragment, which never changes the fetched page."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ''))
+
+def _fingerprint(url: str) -> int:
+    """64-bit fingerprint used for the URL sets, so they hold ints rather than URL strings."""
+    return hash(url)
+
+def _reroot(element: Tag) -> BeautifulSoup:
+    """Move an element into its own document without serializing and re-parsing it."""
+    document = BeautifulSoup('', 'lxml')
+    document.append(element.extract())
+    return document
+
+def _remove_text_blocks(root: Tag, pattern: re.Pattern) -> None:
+    """Remove the parent of every text node matching pattern, using a single walk of the tree."""
+    matches = [node for node in root.descendants
+               if isinstance(node, NavigableString) and pattern.search(node)]
+    for node in matches:
+        # Skip text already removed along with an earlier match
+        if node.decomposed:
+            continue
+        parent = node.parent
+        if parent:
+            parent.decompose()
+
+def _unique_lines(text: str) -> Iterator[str]:
+    """
+    Yield the non-empty lines of text, skipping any seen before (case-insensitively).
+    
+    Lines are matched one at a time rather than split into a list up front, so
+    repeated lines are never held in memory.
+    """
+    seen_lines: Set[int] = set()  # hashes of the lowercased lines, not the lines themselves
+    for match in _NON_EMPTY_LINE_RE.finditer(text):
+        line = match.group()
+        line_hash = hash(line.lower())
+        if line_hash not in seen_lines:
+            seen_lines.add(line_hash)
+            yield line
+
+def _extract_text_from_soup(soup: BeautifulSoup, filter_selector: str) -> str:
+    """
+    Extract and clean text from BeautifulSoup object, focusing on main content
+    and excluding navigation, headers, footers and other non-essential parts.
+    
+    The soup is filtered in place, so callers should pass a freshly parsed tree.
+    """
+    soup_copy = soup
+    
+    # Remove unwanted, navigation and AngelOne-specific elements in one pass
+    for element in soup_copy.select(filter_selector):
+        # Skip elements already removed along with a filtered ancestor
+        if not element.decomposed:
+            element.decompose()
+            
+    # Try to identify the main content area
+    # First, check for specific content identifiers (usually main article area)
+    main_content = None
+    
+    # Look for specific AngelOne content containers
+    for content_selector in ['.support-container', '.faq-container', '.support-content', 
+                           '#support-content', '.article-content', '.content-area',
+                           'main', 'article', '[role="main"]', '.faq-content']:
+        main_content = soup_copy.select_one(content_selector)
+        if main_content:
+            break
+    
+    # If we couldn't find a specific content container, try a more generic approach
+    if not main_content:
+        main_content = soup_copy.find(attrs={'id': _MAIN_ID_RE})
+    if not main_content:
+        main_content = soup_copy.find(attrs={'class': _MAIN_ID_RE})
+    
+    # If we found a main content container, use it
+    if main_content:
+        # Extract only from main content
+        soup_copy = _reroot(main_content)
+    else:
+        # If we can't find a clear main content area, try to remove clearly non-content areas
+        # like repetitive navigation links, and then use what's left
+        _remove_text_blocks(soup_copy, _FALLBACK_NAV_RE)
+        
+        # Remove elements with very few words (likely navigation or button text)
+        for element in soup_copy.find_all(['a', 'span', 'button']):
+            text = element.get_text().strip()
+            if text and len(text.split()) <= 3:
+                element.decompose()
+        
+        # Try to identify the main content based on text density
+        # Content usually has the most text and paragraphs
+        content_candidates = []
+        for element in soup_copy.find_all(['div', 'section', 'article', 'main']):
+            if element.find_all(['p', 'h2', 'h3', 'li']):
+                content_candidates.append((element, len(element.get_text())))
+        
+        # Sort by text length (descending) and use the one with most text
+        if content_candidates:
+            content_candidates.sort(key=lambda x: x[1], reverse=True)
+            soup_copy = _reroot(content_candidates[0][0])
+    
+    # Extract title (prefer page-specific title over site title)
+    title = ""
+    if soup_copy.h1:
+        title = soup_copy.h1.get_text().strip()
+    elif soup_copy.title:
+        title = soup_copy.title.get_text().strip()
+        # Remove site name if present (usually after " - " or " | ")
+        title = _TITLE_SUFFIX_RE.sub('', title)
+    
+    # Remove "Quick Links" and common sections that appear on every page
+    _remove_text_blocks(soup_copy, _COMMON_PHRASES_RE)
+    
+    # Collect headings (h2-h6, h1 is usually handled as title) and paragraphs
+    # in a single walk, dispatching each element to its bucket by tag name
+    headings = []
+    paragraphs = []
+    seen_paragraphs = set()
+    for tag in soup_copy.find_all(_TEXT_TAGS):
+        if tag.name in _HEADING_TAGS:
+            # Skip empty headings or those that look like navigation/menu items
+            heading_text = tag.get_text().strip()
+            if heading_text and len(heading_text) > 1 and not _HEADING_NAV_RE.search(heading_text):
+                if not _COMMON_PHRASES_RE.search(heading_text):
+                    headings.append(heading_text)
+            continue
+        
+        # Paragraphs, list items and sections (main content)
+        # Skip empty elements or very short ones that are likely UI elements
+        p_text = tag.get_text().strip()
+        if p_text and len(p_text) > 5:  # Increased minimum length to filter out more noise
+            # Skip elements that are likely navigation or other non-content elements
+            if not _PARAGRAPH_NAV_RE.search(p_text):
+                # Skip text containing common phrases that appear on every page
+                if not _COMMON_PHRASES_RE.search(p_text):
+                    # Skip repetitive text that appears multiple times
+                    if p_text not in seen_paragraphs:
+                        seen_paragraphs.add(p_text)
+                        paragraphs.append(p_text)
+    
+    # Filter text based on word count (skip very short lines that are likely UI elements)
+    filtered_paragraphs = []
+    for p in paragraphs:
+        # Skip very short lines unless they appear to be bullet points or important items
+        if len(p.split()) > 3 or p.startswith('•') or p.startswith('-'):
+            filtered_paragraphs.append(p)
+            
+    # If we have very few paragraphs but headings, it's likely we have a list of links
+    # In this case, we'll keep the headings but add explanatory text
+    if len(filtered_paragraphs) < 3 and headings:
+        filtered_paragraphs.append("This page appears to be a navigation/category page with the following options:")
+    
+    # Combine all text with proper formatting
+    all_text = []
+    if title:
+        all_text.append(f"# {title}")
+        all_text.append("")
+        
+    if headings:
+        all_text.extend(headings)
+        all_text.append("")
+        
+    if filtered_paragraphs:
+        all_text.extend(filtered_paragraphs)
+    
+    # Clean and normalize text
+    text = "\n".join(all_text)
+    
+    # Remove extra whitespace and normalize
+    text = _WS_MULTI_NL.sub('\n\n', text)  # Remove multiple blank lines
+    text = _WS_SPACES_OR_SINGLE_NL.sub(' ', text)  # Normalize spaces and convert single newlines to spaces
+    
+    # Final cleanup to remove empty and duplicated lines
+    return '\n'.join(_unique_lines(text))
+
+def _parse_html(html: bytes, encoding: Optional[str], filter_selector: str) -> Tuple[str, List[str]]:
+    """
+    Parse a page and return its cleaned text and the targets of its links.
+    
+    Takes bytes and plain arguments rather than a soup or the extractor so it can run in a worker process.
+    """
+    soup = BeautifulSoup(html, 'lxml', parse_only=_PAGE_STRAINER, from_encoding=encoding)
+    
+    # Collect links first, text extraction filters the tree in place
+    hrefs = [link['href'] for link in soup.find_all('a', href=True)]
+    return _extract_text_from_soup(soup, filter_selector), hrefs
 
 class WebsiteTextExtractor:
-    def __init__(self, base_url: str, max_depth: int = 5, delay: float = 1.0, output_dir: str = "./data"):
+    def __init__(self, base_url: str, max_depth: int = 5, delay: float = 1.0, output_dir: str = "./data",
+                 concurrency: int = 8):
         """
         Initialize the website text extractor.
         
         Args:
             base_url: The starting URL to scrape (e.g., "https://www.angelone.in/support")
             max_depth: How many levels deep to follow links (default: 5)
-            delay: Seconds to wait between requests (default: 1.0)
+            delay: Seconds to wait between requests to the same host (default: 1.0)
             output_dir: Directory to save extracted data (default: "./data")
+            concurrency: Number of pages fetched at once (default: 8)
         """
-        self.base_url = base_url
+        self.base_url = _canonicalize_url(base_url)
         self.max_depth = max_depth
         self.delay = delay
-        self.visited_urls: Set[str] = set()
-        self.parsed_domain = urlparse(base_url)
+        self.concurrency = concurrency
+        self.visited_fingerprints: Set[int] = set()  # visited URLs themselves are only written to visited_urls.txt
+        self.parsed_domain = _cached_urlparse(self.base_url)
         self.domain = self.parsed_domain.netloc
         self.base_path = self.parsed_domain.path
         
@@ -49,11 +332,26 @@ class WebsiteTextExtractor:
             'Upgrade-Insecure-Requests': '1'
         }
         
-        # Track pages to visit
-        self.to_visit: List[Tuple[str, int]] = [(self.base_url, 0)]  # (url, depth)
+        # Track pages to visit; URLs are only queued once, from the first (shallowest) page linking to them
+        self.to_visit: deque = deque([(self.base_url, 0)])  # (url, depth)
+        self.enqueued_fingerprints: Set[int] = {_fingerprint(self.base_url)}
+        
+        # robots.txt rules for the domain, read when the crawl starts. Decisions are
+        # cached since the same links are checked from many pages.
+        self.robots = RobotFileParser(f"{self.parsed_domain.scheme}://{self.domain}/robots.txt")
+        self.robots_allowed = lru_cache(maxsize=16384)(self._robots_allowed)
+        
+        # Requests to a host are started at least delay seconds apart, however many workers
+        # are running; a robots.txt Crawl-delay takes precedence over the delay.
+        # Concurrency only overlaps the work of requests whose slots have come up.
+        self.throttle = HostThrottle(delay)
         
         # Results storage
         self.results: Dict[str, str] = {}
+        self.text_file: Optional[TextIO] = None  # open while crawling, pages are appended as they are extracted
+        self.jsonl_file: Optional[TextIO] = None
+        self.visited_file: Optional[TextIO] = None
+        self.parse_pool: Optional[ProcessPoolExecutor] = None  # pages are parsed in worker processes while crawling
 
         # Common elements to filter out (usually navigation, header, footer, etc.)
         self.elements_to_filter = [
@@ -73,6 +371,9 @@ class WebsiteTextExtractor:
             '[class*="footer"]', '[class*="menu"]', '[class*="navigation"]',
             '[class*="nav-"]', '[class*="-nav"]'
         ]
+        
+        # Single selector so the DOM is walked once instead of once per selector
+        self.filter_selector = ", ".join(_UNWANTED_ELEMENTS + self.elements_to_filter + _ANGELONE_SELECTORS)
     
     def extract_all_text(self) -> Dict[str, str]:
         """
@@ -81,78 +382,193 @@ class WebsiteTextExtractor:
         Returns:
             Dictionary with URLs as keys and extracted text as values
         """
-        # Use breadth-first search to crawl the website
-        while self.to_visit:
-            url, depth = self.to_visit.pop(0)
-            
-            if url in self.visited_urls or depth > self.max_depth:
-                continue
+        return asyncio.run(self._extract_async())
+    
+    async def _extract_async(self) -> Dict[str, str]:
+        """Crawl breadth-first, fetching the pages of each depth level concurrently."""
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, keepalive_timeout=60, ttl_dns_cache=300)
+        
+        # The files are truncated so reruns do not accumulate duplicate pages
+        with open(self.output_dir / "website_text.txt", "w", encoding="utf-8") as self.text_file, \
+                open(self.output_dir / "website_data.jsonl", "w", encoding="utf-8") as self.jsonl_file, \
+                open(self.output_dir / "visited_urls.txt", "w", encoding="utf-8") as self.visited_file, \
+                ProcessPoolExecutor(max_workers=os.cpu_count()) as self.parse_pool:
+            async with aiohttp.ClientSession(connector=connector, headers=self.headers) as session:
+                await self._read_robots(session)
+                crawl_delay = self.robots.crawl_delay(self.headers['User-Agent'])
+                if crawl_delay is not None:
+                    self.throttle.interval = float(crawl_delay)
+                if not self.robots_allowed(self.base_url):
+                    logger.warning("%s is disallowed by robots.txt, nothing to crawl", self.base_url)
+                    self.to_visit.clear()
                 
-            self._process_url(url, depth)
-            
-            # Save progress after each page
-            self._save_progress()
+                # Levels are crawled one at a time so every URL keeps its breadth-first depth.
+                # Links found on this level are queued in to_visit for the next one.
+                while self.to_visit:
+                    queue: asyncio.Queue = asyncio.Queue()
+                    while self.to_visit:
+                        queue.put_nowait(self.to_visit.popleft())
+                    
+                    workers = [asyncio.create_task(self._worker(session, queue)) for _ in range(self.concurrency)]
+                    await queue.join()
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
             
+        # Final save
+        self._save_progress()
         return self.results
     
-    def _process_url(self, url: str, depth: int) -> None:
+    async def _read_robots(self, session: aiohttp.ClientSession) -> None:
+        """
+        Fetch and parse robots.txt, retrying transient failures.
+        
+        A missing robots.txt (4xx other than 401/403) allows everything. As RFC 9309 requires,
+        a robots.txt that cannot be read (401/403, 5xx or a network error) disallows everything.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with session.get(self.robots.url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                        logger.warning("Retrying %s after HTTP %s", self.robots.url, response.status)
+                        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+                        continue
+                    
+                    if response.status in (401, 403) or response.status >= 500:
+                        logger.warning("Could not read %s (HTTP %s), not crawling", self.robots.url, response.status)
+                        self.robots.disallow_all = True
+                    elif response.status >= 400:
+                        self.robots.allow_all = True
+                    else:
+                        self.robots.parse((await response.text(errors='replace')).splitlines())
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == MAX_RETRIES:
+                    logger.warning("Could not read %s, not crawling: %s", self.robots.url, e)
+                    self.robots.disallow_all = True
+                    return
+                logger.warning("Retrying %s after error: %s", self.robots.url, e)
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+    
+    def _robots_allowed(self, url: str) -> bool:
+        """Check a URL against robots.txt. Use the cached robots_allowed instead."""
+        return self.robots.can_fetch(self.headers['User-Agent'], url)
+    
+    async def _worker(self, session: aiohttp.ClientSession, queue: asyncio.Queue) -> None:
+        """Process URLs from the queue until cancelled."""
+        while True:
+            url, depth = await queue.get()
+            try:
+                if _fingerprint(url) in self.visited_fingerprints or depth > self.max_depth:
+                    continue
+                
+                await self._process_url(session, url, depth)
+            finally:
+                queue.task_done()
+    
+    async def _process_url(self, session: aiohttp.ClientSession, url: str, depth: int) -> None:
         """Process a single URL, extract text, and find links."""
-        if url in self.visited_urls:
+        if _fingerprint(url) in self.visited_fingerprints:
             return
             
         # Respect crawl delay
-        time.sleep(self.delay)
+        await self.throttle.wait(_cached_urlparse(url).netloc)
         
         try:
-            logger.info(f"Processing: {url} (depth: {depth})")
-            response = requests.get(url, headers=self.headers, timeout=15)
-            
-            # Mark as visited even if there's an error
-            self.visited_urls.add(url)
-            
-            if response.status_code != 200:
-                logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
+            logger.info("Processing: %s (depth: %s)", url, depth)
+            page = await self._fetch(session, url)
+            if page is None:
                 return
-                
-            # Check content type
-            content_type = response.headers.get('Content-Type', '')
-            if 'text/html' not in content_type.lower():
-                logger.warning(f"Skipping non-HTML content at {url}: {content_type}")
-                return
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
             
-            # Extract and clean text
-            text = self._extract_text_from_soup(soup)
+            # Parse in the process pool so other pages keep downloading meanwhile
+            # and parsing is spread across CPU cores
+            loop = asyncio.get_running_loop()
+            html, encoding = page
+            text, hrefs = await loop.run_in_executor(self.parse_pool, _parse_html, html, encoding, self.filter_selector)
             self.results[url] = text
+            self._append_page(url, text)
+            
+            # Checkpoint the full outputs periodically
+            if len(self.results) % SAVE_INTERVAL == 0:
+                self._save_progress()
             
-            # Find all links on the page
-            self._find_links(soup, url, depth)
+            # Queue the links found on the page
+            self._find_links(hrefs, url, depth)
                 
         except Exception as e:
-            logger.error(f"Error processing {url}: {str(e)}")
+            logger.error("Error processing %s: %s", url, e)
     
-    def _find_links(self, soup: BeautifulSoup, current_url: str, current_depth: int) -> None:
-        """Find all links on the page and add valid ones to the to_visit list."""
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        Fetch a URL, retrying transient failures.
+        
+        Returns the raw HTML and the charset from the Content-Type header, or None if the
+        page has no text to extract. The body is left undecoded so no charset sniffing is
+        done on the event loop.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                        logger.warning("Retrying %s after HTTP %s", url, response.status)
+                        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+                        continue
+                    
+                    if response.status != 200:
+                        # Mark as visited even if there's an error
+                        self._mark_visited(url)
+                        logger.warning("Failed to fetch %s: HTTP %s", url, response.status)
+                        return None
+                        
+                    # Check content type
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'text/html' not in content_type.lower():
+                        self._mark_visited(url)
+                        logger.warning("Skipping non-HTML content at %s: %s", url, content_type)
+                        return None
+                    
+                    # Marked only once the body has been read, so a retry after a failed
+                    # read does not record the URL twice
+                    html = await response.read()
+                    self._mark_visited(url)
+                    return html, response.charset
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == MAX_RETRIES:
+                    self._mark_visited(url)
+                    raise
+                logger.warning("Retrying %s after error: %s", url, e)
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+        return None
+    
+    def _mark_visited(self, url: str) -> None:
+        """Record a URL as visited, appending it to visited_urls.txt the first time."""
+        fingerprint = _fingerprint(url)
+        if fingerprint not in self.visited_fingerprints:
+            self.visited_fingerprints.add(fingerprint)
+            self.visited_file.write(f"{url}\n")
+            self.visited_file.flush()
+    
+    def _find_links(self, hrefs: List[str], current_url: str, current_depth: int) -> None:
+        """Add the valid links found on the page to the to_visit list."""
+        for href in hrefs:
             # Skip empty, javascript, and anchor links
             if not href or href.startswith('javascript:') or href.startswith('#'):
                 continue
                 
-            # Build absolute URL
-            next_url = urljoin(current_url, href)
+            # Build absolute URL, canonicalized so variants of a page share one entry
+            next_url = _canonicalize_url(_cached_urljoin(current_url, href))
             
             # Only process URLs that belong to our target domain and path
             if self._should_process_url(next_url):
-                # Add to visit queue if not already visited
-                if next_url not in self.visited_urls:
+                # Add to visit queue if not already visited or queued
+                fingerprint = _fingerprint(next_url)
+                if fingerprint not in self.visited_fingerprints and fingerprint not in self.enqueued_fingerprints:
+                    self.enqueued_fingerprints.add(fingerprint)
                     self.to_visit.append((next_url, current_depth + 1))
     
     def _should_process_url(self, url: str) -> bool:
         """Determine if a URL should be processed based on domain and path."""
-        parsed = urlparse(url)
+        parsed = _cached_urlparse(url)
         
         # Must be same domain
         if parsed.netloc != self.domain:
@@ -162,222 +578,36 @@ class WebsiteTextExtractor:
         if not parsed.path.startswith(self.base_path):
             return False
             
+        # Must be allowed by robots.txt
+        if not self.robots_allowed(url):
+            return False
+            
         # Skip URLs with fragments or queries if the base URL is already visited
         base_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-        if base_url in self.visited_urls and (parsed.fragment or parsed.query):
+        if _fingerprint(base_url) in self.visited_fingerprints and (parsed.fragment or parsed.query):
             return False
             
         return True
     
-    def _extract_text_from_soup(self, soup: BeautifulSoup) -> str:
-        """
-        Extract and clean text from BeautifulSoup object, focusing on main content
-        and excluding navigation, headers, footers and other non-essential parts.
-        """
-        # Create a copy to work with
-        soup_copy = BeautifulSoup(str(soup), 'html.parser')
+    def _append_page(self, url: str, text: str) -> None:
+        """Append one extracted page to the text and JSONL outputs."""
+        if text.strip():  # Only write non-empty content
+            self.text_file.write(f"URL: {url}\n")
+            self.text_file.write("=" * 80 + "\n")
+            self.text_file.write(text)
+            self.text_file.write("\n\n" + "=" * 80 + "\n\n")
+            self.text_file.flush()
         
-        # Remove unwanted elements - first pass (standard elements)
-        for element in soup_copy.select('script, style, meta, link, noscript, iframe, [style*="display:none"], [style*="display: none"]'):
-            element.decompose()
-        
-        # Remove common navigation, header, footer elements - second pass
-        for selector in self.elements_to_filter:
-            for element in soup_copy.select(selector):
-                element.decompose()
-        
-        # AngelOne-specific selectors (based on inspection of the site structure)
-        angelone_selectors = [
-            '.open-account-area', '.download-app-area', '.sip-calc-area',
-            '.search-area', '.top-nav', '.main-nav', '.primary-nav',
-            '.footer-top', '.footer-bottom', '.copyright-area',
-            '.login-area', '.quick-links', '.popular-stocks',
-            '.mobile-menu', '.mobile-nav', '.pricing-section',
-            'nav', '[id*="menu"]', '[class*="menu"]',
-            '.open-account-btn', '.login-btn', '.download-section',
-            '.user-links', '.open-demat', '.quick-links',
-            '.popular-links', '.attention-investors',
-            '.open-free-demat-account', '.oda-footer',
-            'form', '.social-links',
-            # Additional AngelOne specific selectors for common elements
-            '.we-are-here-to-help-you', '.quick-links-10', 
-            '.connect-with-us', '.partnership-request', '.media-queries',
-            '.en', '.hi'
-        ]
-        
-        # Apply AngelOne-specific filtering
-        for selector in angelone_selectors:
-            for element in soup_copy.select(selector):
-                element.decompose()
-                
-        # Try to identify the main content area
-        # First, check for specific content identifiers (usually main article area)
-        main_content = None
-        
-        # Look for specific AngelOne content containers
-        for content_selector in ['.support-container', '.faq-container', '.support-content', 
-                               '#support-content', '.article-content', '.content-area',
-                               'main', 'article', '[role="main"]', '.faq-content']:
-            main_content = soup_copy.select_one(content_selector)
-            if main_content:
-                break
-        
-        # If we couldn't find a specific content container, try a more generic approach
-        if not main_content:
-            main_content = soup_copy.find(attrs={'id': re.compile(r'(main|content|article|post)', re.I)})
-        if not main_content:
-            main_content = soup_copy.find(attrs={'class': re.compile(r'(main|content|article|post)', re.I)})
-        
-        # If we found a main content container, use it
-        if main_content:
-            # Extract only from main content
-            soup_copy = BeautifulSoup(str(main_content), 'html.parser')
-        else:
-            # If we can't find a clear main content area, try to remove clearly non-content areas
-            # like repetitive navigation links, and then use what's left
-            for element in soup_copy.find_all(string=lambda text: text and any(nav_text in text.lower() for nav_text in 
-                                       ['login', 'sign up', 'open account', 'download', 'download app', 
-                                        'register', 'create account', 'quick links', 'we are here to help you',
-                                        'connect with us', 'partnership request', 'media queries'])):
-                parent = element.parent
-                if parent:
-                    parent.decompose()
-            
-            # Remove elements with very few words (likely navigation or button text)
-            for element in soup_copy.find_all(['a', 'span', 'button']):
-                text = element.get_text().strip()
-                if text and len(text.split()) <= 3:
-                    element.decompose()
-            
-            # Try to identify the main content based on text density
-            # Content usually has the most text and paragraphs
-            content_candidates = []
-            for element in soup_copy.find_all(['div', 'section', 'article', 'main']):
-                if element.find_all(['p', 'h2', 'h3', 'li']):
-                    content_candidates.append((element, len(element.get_text())))
-            
-            # Sort by text length (descending) and use the one with most text
-            if content_candidates:
-                content_candidates.sort(key=lambda x: x[1], reverse=True)
-                soup_copy = BeautifulSoup(str(content_candidates[0][0]), 'html.parser')
-        
-        # Extract title (prefer page-specific title over site title)
-        title = ""
-        if soup_copy.h1:
-            title = soup_copy.h1.get_text().strip()
-        elif soup_copy.title:
-            title = soup_copy.title.get_text().strip()
-            # Remove site name if present (usually after " - " or " | ")
-            title = re.sub(r'\s*[\-\|]\s*.+$', '', title)
-        
-        # Remove "Quick Links" and common sections that appear on every page
-        common_phrases = [
-            "We are here to help you", "Quick Links", "Track Application Status",
-            "Want to connect with us?", "Connect with us", "Partnership Request", 
-            "Media Queries", "Our experts will be happy to assist you",
-            "Still have any queries?", "Connect with our support team", 
-            "For any partnership requests please reach us at", "EMAIL US",
-            "partners@angelbroking.com", "Learn More", "Create Ticket",
-            "022-40003600", "CONTACT US"
-        ]
-        
-        for phrase in common_phrases:
-            for element in soup_copy.find_all(string=lambda text: text and phrase in text):
-                parent = element.parent
-                if parent:
-                    parent.decompose()
-        
-        # Extract headings from h2-h6 (h1 is usually handled as title)
-        headings = []
-        for h_tag in soup_copy.find_all(['h2', 'h3', 'h4', 'h5', 'h6']):
-            # Skip empty headings or those that look like navigation/menu items
-            heading_text = h_tag.get_text().strip()
-            if heading_text and len(heading_text) > 1 and not any(nav_word in heading_text.lower() for nav_word in ['menu', 'navigation', 'login', 'download', 'open demat']):
-                if not any(phrase in heading_text for phrase in common_phrases):
-                    headings.append(heading_text)
-        
-        # Extract paragraphs and list items (main content)
-        paragraphs = []
-        for p_tag in soup_copy.find_all(['p', 'li', 'div.content', 'section']):
-            # Skip empty elements or very short ones that are likely UI elements
-            p_text = p_tag.get_text().strip()
-            if p_text and len(p_text) > 5:  # Increased minimum length to filter out more noise
-                # Skip elements that are likely navigation or other non-content elements
-                if not any(nav_word in p_text.lower() for nav_word in ['login', 'signup', 'sign up', 'download', 'cookie', 'privacy', 'open demat', 'download app']):
-                    # Skip text containing common phrases that appear on every page
-                    if not any(phrase in p_text for phrase in common_phrases):
-                        # Skip repetitive text that appears multiple times
-                        if p_text not in paragraphs:
-                            paragraphs.append(p_text)
-        
-        # Filter text based on word count (skip very short lines that are likely UI elements)
-        filtered_paragraphs = []
-        for p in paragraphs:
-            # Skip very short lines unless they appear to be bullet points or important items
-            if len(p.split()) > 3 or p.startswith('•') or p.startswith('-'):
-                filtered_paragraphs.append(p)
-                
-        # If we have very few paragraphs but headings, it's likely we have a list of links
-        # In this case, we'll keep the headings but add explanatory text
-        if len(filtered_paragraphs) < 3 and headings:
-            filtered_paragraphs.append("This page appears to be a navigation/category page with the following options:")
-        
-        # Combine all text with proper formatting
-        all_text = []
-        if title:
-            all_text.append(f"# {title}")
-            all_text.append("")
-            
-        if headings:
-            all_text.extend(headings)
-            all_text.append("")
-            
-        if filtered_paragraphs:
-            all_text.extend(filtered_paragraphs)
-        
-        # Clean and normalize text
-        text = "\n".join(all_text)
-        
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # Remove multiple blank lines
-        text = re.sub(r' +', ' ', text)  # Normalize spaces
-        text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)  # Convert single newlines to spaces
-        
-        # Final cleanup to remove duplicated content
-        lines = text.split('\n')
-        unique_lines = []
-        seen_lines = set()
-        
-        for line in lines:
-            line_lower = line.lower()
-            # Skip empty lines or lines we've seen before
-            if line and line_lower not in seen_lines:
-                unique_lines.append(line)
-                seen_lines.add(line_lower)
-        
-        return '\n'.join(unique_lines)
+        self.jsonl_file.write(json.dumps({"url": url, "text": text}, ensure_ascii=False) + "\n")
+        self.jsonl_file.flush()
     
     def _save_progress(self) -> None:
-        """Save current results to files."""
+        """Save current results to files. The text, JSONL and visited URL outputs are written while crawling."""
         # Save as JSON
         with open(self.output_dir / "website_data.json", "w", encoding="utf-8") as f:
             json.dump(self.results, f, indent=2, ensure_ascii=False)
-            
-        # Save as text file (all content combined)
-        with open(self.output_dir / "website_text.txt", "w", encoding="utf-8") as f:
-            for url, text in self.results.items():
-                if text.strip():  # Only write non-empty content
-                    f.write(f"URL: {url}\n")
-                    f.write("=" * 80 + "\n")
-                    f.write(text)
-                    f.write("\n\n" + "=" * 80 + "\n\n")
-                
-        # Save URLs visited
-        with open(self.output_dir / "visited_urls.txt", "w", encoding="utf-8") as f:
-            for url in sorted(self.visited_urls):
-                f.write(f"{url}\n")
                 
-        logger.info(f"Saved {len(self.results)} pages to {self.output_dir}")
+        logger.info("Saved %s pages to %s", len(self.results), self.output_dir)
 
 
 # Example usage
@@ -392,5 +622,5 @@ if __name__ == "__main__":
     logger.info("Starting extraction...")
     all_text = extractor.extract_all_text()
     
-    logger.info(f"Extraction complete. Processed {len(extractor.visited_urls)} URLs and extracted text from {len(all_text)} pages.")
-    logger.info(f"Results saved to {extractor.output_dir}")
\ No newline at end of file
+    logger.info("Extraction complete. Processed %s URLs and extracted text from %s pages.", len(extractor.visited_fingerprints), len(all_text))
+    logger.info("Results saved to %s", extractor.output_dir)
\ No newline at end of file